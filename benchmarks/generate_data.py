@@ -0,0 +1,96 @@
+# Task: Generate synthetic weather CSV files, shaped like the real dataset, for the benchmarks
+import argparse
+import csv
+import logging
+import os
+import random
+from datetime import date, timedelta
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FIRST_DAY = date(2010, 1, 3)
+DAYS = 3640  # About ten years of weekly-dated data, sorted by Date.Full like the real file
+
+HEADER = [
+    'Data.Precipitation', 'Date.Full', 'Date.Month', 'Date.Week of', 'Date.Year',
+    'Station.City', 'Station.Code', 'Station.Location', 'Station.State',
+    'Data.Temperature.Avg Temp', 'Data.Temperature.Max Temp', 'Data.Temperature.Min Temp',
+    'Data.Wind.Direction', 'Data.Wind.Speed'
+]
+STATES = [
+    ('Alabama', 'AL'), ('Alaska', 'AK'), ('Arizona', 'AZ'), ('California', 'CA'), ('Colorado', 'CO'),
+    ('Florida', 'FL'), ('Georgia', 'GA'), ('Illinois', 'IL'), ('Massachusetts', 'MA'), ('Michigan', 'MI'),
+    ('New York', 'NY'), ('Ohio', 'OH'), ('Oregon', 'OR'), ('Texas', 'TX'), ('Washington', 'WA')
+]
+STATIONS_PER_STATE = 20
+
+
+def stations():
+    """Return (city, code, location, state) tuples for every synthetic station."""
+    result = []
+    for state, abbreviation in STATES:
+        for number in range(STATIONS_PER_STATE):
+            city = f"{state} City {number}"
+            result.append((city, f"{abbreviation}{number:02d}", f"{city}, {abbreviation}", state))
+    return result
+
+
+def dataset_path(data_dir, rows):
+    """Return the file used for a dataset size, e.g. weather_10000.csv."""
+    return os.path.join(data_dir, f"weather_{rows}.csv")
+
+
+def date_ranges():
+    """Return the named (start, end) date ranges benchmarked for every dataset."""
+    middle = FIRST_DAY + timedelta(days=DAYS // 2)
+    return {
+        'narrow': (middle.isoformat(), (middle + timedelta(days=30)).isoformat()),
+        'wide': (FIRST_DAY.isoformat(), (FIRST_DAY + timedelta(days=DAYS - 1)).isoformat())
+    }
+
+
+def generate_csv(output_file, rows, seed=1):
+    """Write rows weather observations, spread evenly over DAYS days in date order."""
+    rng = random.Random(seed)
+    all_stations = stations()
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            day = FIRST_DAY + timedelta(days=i * DAYS // rows)
+            city, code, location, state = rng.choice(all_stations)
+            max_temp = rng.randint(10, 110)
+            min_temp = max_temp - rng.randint(0, 30)
+            writer.writerow([
+                round(rng.random(), 2), day.isoformat(), day.month, day.day, day.year,
+                city, code, location, state,
+                (max_temp + min_temp) // 2, max_temp, min_temp,
+                rng.randint(0, 36), round(rng.random() * 20, 2)
+            ])
+
+
+def ensure_dataset(data_dir, rows):
+    """Return the dataset of the given size, generating it only if it does not exist yet."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset_path(data_dir, rows)
+    if not os.path.isfile(path):
+        logging.info(f"Generating {rows} rows into {path}")
+        generate_csv(path + '.tmp', rows)
+        os.replace(path + '.tmp', path)  # Never leave a half-written dataset behind
+    return path
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Generate synthetic weather CSV files")
+    parser.add_argument(
+        '--rows', type=int, nargs='+', required=True, help="Number of rows of each file to generate"
+    )
+    parser.add_argument(
+        '--data-dir', type=str, default='benchmark_data', help="Directory the files are written to"
+    )
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        ensure_dataset(args.data_dir, rows)
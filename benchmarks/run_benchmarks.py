@@ -0,0 +1,179 @@
+# Task: Time every analysis of both implementations over generated inputs and flag regressions
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from generate_data import date_ranges, ensure_dataset
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TREES = {
+    'python': os.path.join(ROOT, 'weather_task'),
+    'pandas': os.path.join(ROOT, 'weather_task_with_Machine_Learning')
+}
+# Analysis name -> script of each tree
+ANALYSES = {
+    'avg_cal': {'python': 'avg_cal.py', 'pandas': 'avg_cal.py'},
+    'highest_temp_day': {'python': 'highest_temp_day.py', 'pandas': 'highest_temp_day.py'},
+    'lowest_avg_temp_year': {'python': 'lowest_avg_temp_year.py', 'pandas': 'lowest_avg_temp_year.py'},
+    'max_min_state_temp': {'python': 'max_min_state_temp.py', 'pandas': 'max_min_state.py'},
+    'max_month_temp': {'python': 'max_month_temp.py', 'pandas': 'max_month_temp.py'},
+    'max_occurance_state': {'python': 'max_occurance_state.py', 'pandas': 'max_occurance.py'},
+    'max_temp_state': {'python': 'max_temp_state.py', 'pandas': 'max_temp.py'}
+}
+DEFAULT_SIZES = [10000, 1000000, 10000000]
+
+
+class BenchmarkRunner:
+    def __init__(self, data_dir, sizes, trees, analyses, repeat=1):
+        self.data_dir = data_dir
+        self.sizes = sizes
+        self.trees = trees
+        self.analyses = analyses
+        self.repeat = repeat  # Runs per case; the fastest wall time and the largest RSS are kept
+
+    def run_script(self, tree, analysis, input_file, start_date, end_date):
+        """Run one analysis script in a child process and return (wall time, peak RSS in KB)."""
+        with tempfile.TemporaryDirectory() as output_dir, tempfile.TemporaryFile() as errors:
+            command = [
+                sys.executable, ANALYSES[analysis][tree],
+                '--start-date', start_date, '--end-date', end_date,
+                '--input-file', os.path.abspath(input_file),
+                '--output-file', os.path.join(output_dir, 'output.csv')
+            ]
+            started = time.perf_counter()
+            process = subprocess.Popen(command, cwd=TREES[tree], stdout=subprocess.DEVNULL, stderr=errors)
+            # wait4 reports the resource usage of this child alone
+            _, status, usage = os.wait4(process.pid, 0)
+            wall_time = time.perf_counter() - started
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+            if process.returncode != 0:
+                errors.seek(0)
+                message = errors.read().decode(errors='replace').strip().splitlines()
+                raise RuntimeError(f"{tree}/{analysis} exited with {process.returncode}: {message[-1:]}")
+
+        return wall_time, usage.ru_maxrss
+
+    def run_case(self, tree, analysis, rows, range_name):
+        """Benchmark one analysis of one tree over one dataset and date range."""
+        input_file = ensure_dataset(self.data_dir, rows)
+        start_date, end_date = date_ranges()[range_name]
+        runs = [self.run_script(tree, analysis, input_file, start_date, end_date) for _ in range(self.repeat)]
+        wall_time = min(run[0] for run in runs)
+        return {
+            'rows': rows,
+            'wall_time': round(wall_time, 4),
+            'rows_per_second': round(rows / wall_time),  # Every analysis reads the whole file
+            'peak_rss_kb': max(run[1] for run in runs)
+        }
+
+    def run(self):
+        """Run every case and return the results keyed by tree/analysis/rows/range."""
+        results = {}
+        for rows in self.sizes:
+            for range_name in date_ranges():
+                for analysis in self.analyses:
+                    for tree in self.trees:
+                        key = f"{tree}/{analysis}/{rows}/{range_name}"
+                        try:
+                            results[key] = self.run_case(tree, analysis, rows, range_name)
+                        except RuntimeError as e:
+                            logging.error(f"Benchmark {key} failed: {e}")
+                            continue
+                        logging.info(f"{key}: {results[key]['wall_time']}s, "
+                                     f"{results[key]['rows_per_second']} rows/s, {results[key]['peak_rss_kb']} KB")
+        return results
+
+
+def find_regressions(results, baseline, threshold):
+    """Compare results against a baseline and describe every case that got slower or bigger."""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in ('wall_time', 'peak_rss_kb'):
+            if result[metric] > previous[metric] * (1 + threshold):
+                change = (result[metric] / previous[metric] - 1) * 100
+                regressions.append(f"{key}: {metric} {previous[metric]} -> {result[metric]} (+{change:.1f}%)")
+    return regressions
+
+
+def save_results(results, output_file):
+    """Write the results together with a description of the machine they were measured on."""
+    document = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': results
+    }
+    with open(output_file, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    logging.info(f"Results saved to {output_file}")
+
+
+def load_results(baseline_file):
+    """Read the results of an earlier run saved by save_results()."""
+    with open(baseline_file) as f:
+        return json.load(f)['results']
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Benchmark the weather analyses of both implementations")
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Row counts of the generated inputs"
+    )
+    parser.add_argument(
+        '--trees', nargs='+', choices=list(TREES), default=list(TREES), help="Implementations to benchmark"
+    )
+    parser.add_argument(
+        '--analyses', nargs='+', choices=list(ANALYSES), default=list(ANALYSES), help="Analyses to benchmark"
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=1, help="Runs per case, the fastest one is reported"
+    )
+    parser.add_argument(
+        '--data-dir', type=str, default='benchmark_data', help="Directory holding the generated inputs"
+    )
+    parser.add_argument(
+        '--output-file', type=str, default='benchmark_results.json', help="JSON file the results are saved to"
+    )
+    parser.add_argument(
+        '--baseline', type=str, help="JSON results of an earlier run to compare against"
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=0.1, help="Relative slowdown or growth reported as a regression"
+    )
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        parser.error("Number of runs must be at least 1.")
+
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = load_results(args.baseline)
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"Cannot read baseline '{args.baseline}': {e}")
+
+    runner = BenchmarkRunner(args.data_dir, args.sizes, args.trees, args.analyses, args.repeat)
+    results = runner.run()
+    save_results(results, args.output_file)
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            logging.warning(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        logging.info(f"No regressions against {args.baseline}")
@@ -1,28 +1,140 @@
 import argparse
+import atexit
+import importlib.util
 import os
 from datetime import datetime
+from numpy_engine import ENGINES
+from metrics import metrics
+from date_filter import read_date_ranges
+from checkpoint import checkpoint_path
+from result_cache import add_cache_arguments
 
 class ArgParser:
-    def __init__(self):
+    def __init__(self, allow_ranges=False, allow_incremental=False, allow_top=True, allow_engine=True, allow_cache=True):
         self.parser = argparse.ArgumentParser(description="Weather Data Analysis")
+        self.allow_ranges = allow_ranges  # Accept --ranges-file instead of a single date range
+        self.allow_incremental = allow_incremental  # Accept --incremental, for analyses that keep a checkpoint
+        self.allow_top = allow_top  # Accept --top, for analyses that rank their results
+        self.allow_engine = allow_engine  # Accept --engine, for analyses with a numpy code path
+        self.allow_cache = allow_cache  # Accept the result cache options, for analyses run through run_cached
 
         # Adding arguments for date range, input file, and output file
         self.parser.add_argument(
-            '--start-date', type=str, required=True, help="Start date for the analysis (YYYY-MM-DD)"
+            '--start-date', type=str, required=not allow_ranges, help="Start date for the analysis (YYYY-MM-DD)"
         )
         self.parser.add_argument(
-            '--end-date', type=str, required=True, help="End date for the analysis (YYYY-MM-DD)"
+            '--end-date', type=str, required=not allow_ranges, help="End date for the analysis (YYYY-MM-DD)"
         )
+        if allow_ranges:
+            self.parser.add_argument(
+                '--ranges-file', type=str,
+                help="File of 'start_date,end_date[,analysis,...]' lines, all answered from one scan"
+            )
         self.parser.add_argument(
             '--input-file', type=str, required=True, help="Input CSV file with weather data"
         )
         self.parser.add_argument(
             '--output-file', type=str, required=True, help="Output CSV file for results"
         )
+        self.parser.add_argument(
+            '--top', type=int, default=1 if allow_top else None,
+            help="Report the K best results (hottest days, most reported states, ...) instead of only the best one"
+            if allow_top else argparse.SUPPRESS
+        )
+
+        # Adding arguments that control how the input file is scanned
+        self.parser.add_argument(
+            '--sorted-input', action='store_true',
+            help="Input CSV is ordered by Date.Full: skip ahead to the start date and stop after the end date"
+        )
+        self.parser.add_argument(
+            '--engine', choices=ENGINES, default='python' if allow_engine else None,
+            help="Aggregate row by row in Python or in vectorized NumPy batches" if allow_engine else argparse.SUPPRESS
+        )
+        self.parser.add_argument(
+            '--workers', type=int, default=1, help="Number of processes parsing the input file in parallel"
+        )
+
+        self.parser.add_argument(
+            '--incremental', action='store_true',
+            help="Keep a checkpoint next to the output file and on later runs only read the rows appended since"
+            if allow_incremental else argparse.SUPPRESS
+        )
+
+        # Adding arguments for the result cache
+        if allow_cache:
+            add_cache_arguments(self.parser)
+
+        # Adding arguments for run metrics
+        self.parser.add_argument(
+            '--metrics-file', type=str, help="Write per-phase timings, row counts and peak memory to this JSON file"
+        )
+        self.parser.add_argument(
+            '--trace-memory', action='store_true',
+            help="Also record the Python heap peak with tracemalloc in the metrics (slows the run down)"
+        )
 
     def parse_args(self):
         args = self.parser.parse_args()
-        
+        args.ranges_file = getattr(args, 'ranges_file', None)
+        args.ranges = None
+
+        if args.ranges_file:
+            # Batch mode: the date ranges come from the ranges file
+            try:
+                args.ranges = read_date_ranges(args.ranges_file)
+            except OSError as e:
+                self.parser.error(f"Cannot read ranges file: {e}")
+            except ValueError as e:
+                self.parser.error(f"Invalid date range: {e}")
+        else:
+            if args.start_date is None or args.end_date is None:
+                self.parser.error("--start-date and --end-date are required unless --ranges-file is given.")
+            self.validate_date_range(args)
+
+        # Only some analyses can resume from a checkpoint
+        if args.incremental and not self.allow_incremental:
+            self.parser.error("--incremental is not supported by this analysis.")
+
+        # Only ranking analyses report more than one result, and only some have a numpy code path
+        if not self.allow_top:
+            if args.top is not None:
+                self.parser.error("--top is not supported by this analysis.")
+            args.top = 1
+        if not self.allow_engine:
+            if args.engine is not None:
+                self.parser.error("--engine is not supported by this analysis.")
+            args.engine = 'python'
+
+        # Check the number of reported results
+        if args.top < 1:
+            self.parser.error("Number of top results must be at least 1.")
+
+        # Check the number of worker processes
+        if args.workers < 1:
+            self.parser.error("Number of workers must be at least 1.")
+
+        # Check the size limit of the result cache
+        if self.allow_cache and args.cache_size_mb < 1:
+            self.parser.error("Cache size must be at least 1 MB.")
+
+        # The numpy engine needs NumPy to be installed
+        if args.engine == 'numpy' and importlib.util.find_spec('numpy') is None:
+            self.parser.error("The numpy engine requires NumPy to be installed.")
+
+        # Check if input file exists
+        if not os.path.isfile(args.input_file):
+            self.parser.error(f"Input file '{args.input_file}' does not exist.")
+
+        # Collect metrics from here on and write them when the script exits
+        if args.metrics_file:
+            metrics.enable(trace_memory=args.trace_memory)
+            atexit.register(metrics.save, args.metrics_file)
+
+        return args
+
+    def validate_date_range(self, args):
+        """Convert the start and end dates to datetime objects, exiting on invalid ones."""
         # Validate date formats
         try:
             args.start_date = datetime.strptime(args.start_date, '%Y-%m-%d')
@@ -34,8 +146,15 @@ class ArgParser:
         if args.start_date > args.end_date:
             self.parser.error("Start date must be less than or equal to end date.")
 
-        # Check if input file exists
-        if not os.path.isfile(args.input_file):
-            self.parser.error(f"Input file '{args.input_file}' does not exist.")
+    def scan_options(self, args):
+        """Collect the parsed options that are passed on to WeatherRowStream."""
+        return {
+            'sorted_input': args.sorted_input,
+            'workers': args.workers
+        }
 
-        return args
+    def checkpoint_file(self, args):
+        """Return the checkpoint used by --incremental runs, or None for a full scan."""
+        if not args.incremental:
+            return None
+        return checkpoint_path(args.output_file)
@@ -0,0 +1,173 @@
+import heapq
+from collections import defaultdict
+
+
+class RunningAverage:
+    """Keep a running sum and count so an average never needs the individual values."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value):
+        """Add a single value to the running sum."""
+        self.total += value
+        self.count += 1
+
+    def add_total(self, total, count):
+        """Add the sum and count of a whole batch of values."""
+        self.total += total
+        self.count += count
+
+    def merge(self, other):
+        """Fold another running average into this one."""
+        self.add_total(other.total, other.count)
+
+    @property
+    def value(self):
+        """Return the average, or None if no values were added."""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+
+class RunningExtreme:
+    """Track the largest (or smallest) value seen so far together with the item it belongs to.
+
+    Only a strictly better value replaces the current one, so on ties the first item seen wins.
+    Values added with a position (their row's place in the file) also resolve ties on merge
+    by position, so partials merged out of file order give the same result as one scan.
+    """
+
+    def __init__(self, mode='max'):
+        if mode not in ('max', 'min'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode
+        self.value = float('-inf') if mode == 'max' else float('inf')
+        self.item = None  # Item (row, record, ...) holding the extreme value
+        self.position = None  # Position in the file of the item's row, if given
+        self.count = 0
+
+    def is_better(self, value):
+        """Check whether value would replace the current extreme."""
+        if self.mode == 'max':
+            return value > self.value
+        return value < self.value
+
+    def add(self, value, item, count=1, position=None):
+        """Offer a value and its item; keep it if it beats the current extreme.
+
+        count is the number of rows the value was picked from, e.g. the size of a batch.
+        """
+        self.count += count
+        if self.is_better(value):
+            self.value = value
+            self.item = item
+            self.position = position
+
+    def merge(self, other):
+        """Fold another running extreme into this one; on a tie the earlier position wins, if both have one."""
+        self.count += other.count
+        if other.item is None:
+            return
+        earlier = (
+            other.value == self.value and other.position is not None and self.position is not None
+            and other.position < self.position
+        )
+        if self.is_better(other.value) or earlier:
+            self.value = other.value
+            self.item = other.item
+            self.position = other.position
+
+    def shift(self, offset):
+        """Move the position by offset, e.g. when a worker's row numbers continue the parent's."""
+        if self.position is not None:
+            self.position += offset
+
+    def items(self):
+        """Return the extreme as a one-element [(value, item)] list, or [] if nothing was added."""
+        if self.item is None:
+            return []
+        return [(self.value, self.item)]
+
+
+class RunningTopK:
+    """Track the k largest (or smallest) values seen so far with their items, in a bounded heap.
+
+    A value only costs a heap operation when it makes it into the top k. As with
+    RunningExtreme, ties go to the item seen first, so with k=1 both give the same result;
+    values added with a position are ordered by it instead, also across merges.
+    """
+
+    def __init__(self, k, mode='max'):
+        if mode not in ('max', 'min'):
+            raise ValueError(f"Unknown mode: {mode}")
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        self.mode = mode
+        self.heap = []  # (key, -order, value, item), the weakest kept value on top
+        self.sequence = 0  # Order in which values were kept, breaks ties
+        self.positioned = False  # Orders are positions in the file rather than sequence numbers
+        self.count = 0
+
+    def key(self, value):
+        """Return the heap key of a value, larger is better in both modes."""
+        return value if self.mode == 'max' else -value
+
+    def is_better(self, value):
+        """Check whether value would make it into the top k."""
+        return len(self.heap) < self.k or self.key(value) > self.heap[0][0]
+
+    def add(self, value, item, count=1, position=None):
+        """Offer a value and its item; keep it if it beats the weakest of the top k.
+
+        count is the number of rows the value was picked from, e.g. the size of a batch.
+        """
+        self.count += count
+        if position is None:
+            position = self.sequence
+        else:
+            self.positioned = True
+        entry = (self.key(value), -position, value, item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+        else:
+            return
+        self.sequence += 1
+
+    def merge(self, other):
+        """Fold another top k into this one, its items counting as seen after ours unless they have positions."""
+        self.count += other.count
+        for _, order, value, item in sorted(other.heap, key=lambda entry: -entry[1]):
+            self.add(value, item, count=0, position=-order if other.positioned else None)
+
+    def shift(self, offset):
+        """Move the positions by offset, e.g. when a worker's row numbers continue the parent's."""
+        if self.positioned:
+            self.heap = [(key, order - offset, value, item) for key, order, value, item in self.heap]
+
+    def items(self):
+        """Return the kept (value, item) pairs, best first."""
+        return [(value, item) for _, _, value, item in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def running_extreme(mode='max', top=1):
+    """Create a tracker for the best value, or for the top best values when top is above 1."""
+    if top == 1:
+        return RunningExtreme(mode)
+    return RunningTopK(top, mode)
+
+
+def grouped_averages():
+    """Create a mapping of group key -> RunningAverage that fills itself on first use."""
+    return defaultdict(RunningAverage)
+
+
+def merge_grouped_averages(target, source):
+    """Fold the running averages of source into target, group by group."""
+    for key, average in source.items():
+        target[key].merge(average)
+    return target
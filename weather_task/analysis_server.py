@@ -0,0 +1,214 @@
+# Task: Serve weather analyses over HTTP from a dataset kept in memory between queries
+import argparse
+import csv
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+from date_filter import parse_date
+from date_index import file_identity
+from daily_buckets import DailyBuckets
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from run_all import ANALYSES, CombinedWeatherRunner
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Range covering every date a weather file can hold
+FIRST_DATE = datetime(1000, 1, 1)
+LAST_DATE = datetime(9999, 12, 31)
+
+
+class ResidentDataset:
+    """The whole input file, scanned once into per-day partial analyzers.
+
+    A query merges the days of its range into a fresh analyzer, so it never reads the file.
+    The partials are only read after load(), which makes concurrent queries safe.
+    """
+
+    def __init__(self, input_file, scan_options=None):
+        self.input_file = input_file
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.identity = None  # (size, mtime) of the file as it was loaded
+        self.buckets = {}  # Analysis name -> DailyBuckets
+        self.rows = 0
+        self.loaded_at = None
+
+    def load(self):
+        """Scan the file into daily buckets for every analysis and return self."""
+        self.identity = file_identity(self.input_file)  # Taken first, so a change during the scan triggers a reload
+        templates = CombinedWeatherRunner(self.input_file, FIRST_DATE, LAST_DATE, os.devnull).build_analyzers()
+        self.buckets = dict(zip(ANALYSES, (DailyBuckets(template) for template in templates)))
+
+        stream = WeatherRowStream(self.input_file, FIRST_DATE, LAST_DATE, **self.scan_options)
+        for bucket in self.buckets.values():
+            stream.register(bucket)
+        self.rows = stream.run()
+        self.loaded_at = datetime.now()
+        return self
+
+    def is_stale(self):
+        """Check whether the input file changed since it was loaded."""
+        return file_identity(self.input_file) != self.identity
+
+    def query(self, name, start_date, end_date):
+        """Answer one analysis for a date range; return its output rows, or None without data."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            # The analyzer writes its usual CSV output, which is read back as the answer
+            runner = CombinedWeatherRunner(self.input_file, start_date, end_date, os.path.join(output_dir, 'result.csv'))
+            analyzer = runner.build_analyzers([name])[0]
+            self.buckets[name].answer(analyzer, start_date, end_date).report()
+
+            output_file = runner.output_path(name)
+            if not os.path.isfile(output_file):
+                return None
+            with open(output_file, newline='') as f:
+                rows = list(csv.reader(f))
+
+        return {'analysis': name, 'header': rows[0], 'rows': rows[1:]}
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """Handle GET /analyses, /health and /query?analysis=...&start_date=...&end_date=..."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/analyses':
+            self.send_json(200, {'analyses': ANALYSES})
+        elif url.path == '/health':
+            dataset = self.server.dataset
+            self.send_json(200, {
+                'input_file': dataset.input_file,
+                'rows': dataset.rows,
+                'loaded_at': dataset.loaded_at.isoformat(timespec='seconds')
+            })
+        elif url.path == '/query':
+            self.handle_query(parse_qs(url.query))
+        else:
+            self.send_json(404, {'error': f"Unknown path {url.path}"})
+
+    def handle_query(self, params):
+        """Validate the query parameters and answer from the current dataset."""
+        name = params.get('analysis', [''])[0]
+        if name not in ANALYSES:
+            self.send_json(400, {'error': f"Unknown analysis '{name}', expected one of {', '.join(ANALYSES)}"})
+            return
+
+        try:
+            start_date = parse_date(params['start_date'][0])
+            end_date = parse_date(params['end_date'][0])
+        except KeyError as e:
+            self.send_json(400, {'error': f"Missing parameter {e}"})
+            return
+        except ValueError as e:
+            self.send_json(400, {'error': f"Invalid date format: {e}"})
+            return
+        if start_date > end_date:
+            self.send_json(400, {'error': "Start date must be less than or equal to end date."})
+            return
+
+        result = self.server.dataset.query(name, start_date, end_date)
+        if result is None:
+            self.send_json(404, {'error': "No data available for the specified date range."})
+        else:
+            self.send_json(200, result)
+
+    def send_json(self, status, body):
+        """Send a JSON response."""
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+
+class AnalysisServer(HTTPServer):
+    """HTTP server answering queries from a resident dataset on a fixed pool of threads."""
+
+    def __init__(self, address, dataset, threads=8, poll_interval=2.0):
+        super().__init__(address, AnalysisRequestHandler)
+        self.dataset = dataset  # Replaced as a whole on reload, requests keep the one they started with
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.poll_interval = poll_interval  # Seconds between checks of the input file
+        self.stopped = threading.Event()
+        self.watcher = threading.Thread(target=self.watch_input, daemon=True)
+
+    def process_request(self, request, client_address):
+        """Hand the connection to the thread pool instead of handling it inline."""
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def watch_input(self):
+        """Reload the dataset in the background whenever the input file changes."""
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                if not self.dataset.is_stale():
+                    continue
+                logging.info(f"{self.dataset.input_file} changed, reloading.")
+                self.dataset = ResidentDataset(self.dataset.input_file, self.dataset.scan_options).load()
+                logging.info(f"Reloaded {self.dataset.rows} rows.")
+            except (OSError, MissingColumnError) as e:
+                logging.warning(f"Cannot reload {self.dataset.input_file}: {e}")
+
+    def serve(self):
+        """Serve until interrupted, then stop the watcher and the thread pool."""
+        self.watcher.start()
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Shutting down.")
+        finally:
+            self.stopped.set()
+            self.server_close()
+            self.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Serve weather analyses from a dataset kept in memory")
+    parser.add_argument(
+        '--input-file', type=str, required=True, help="Input CSV file with weather data"
+    )
+    parser.add_argument(
+        '--host', type=str, default='127.0.0.1', help="Address to listen on"
+    )
+    parser.add_argument(
+        '--port', type=int, default=8765, help="Port to listen on"
+    )
+    parser.add_argument(
+        '--threads', type=int, default=8, help="Number of threads answering queries"
+    )
+    parser.add_argument(
+        '--poll-interval', type=float, default=2.0, help="Seconds between checks for changes to the input file"
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_file):
+        parser.error(f"Input file '{args.input_file}' does not exist.")
+    if args.threads < 1:
+        parser.error("Number of threads must be at least 1.")
+
+    try:
+        dataset = ResidentDataset(args.input_file).load()
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
+    server = AnalysisServer((args.host, args.port), dataset, threads=args.threads, poll_interval=args.poll_interval)
+    logging.info(f"Serving {dataset.rows} rows on http://{args.host}:{args.port}")
+    server.serve()
@@ -3,71 +3,116 @@ import csv
 import logging
 from datetime import datetime
 from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from metrics import metrics
+from result_cache import run_cached
+from accumulators import RunningAverage
+from prefix_index import PrefixSumIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class WeatherDataProcessor:
-    def __init__(self, input_file: str, output_file: str, start_date: datetime, end_date: datetime):
+    COLUMNS = ['Data.Temperature.Max Temp', 'Data.Temperature.Min Temp', 'Data.Wind.Direction', 'Data.Wind.Speed']  # CSV columns read from each row
+
+    def __init__(self, input_file: str, output_file: str, start_date: datetime, end_date: datetime, scan_options: dict = None, engine: str = 'python'):
         self.input_file = input_file
         self.output_file = output_file
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
         self.start_date = start_date
         self.end_date = end_date
-        self.filtered_data = []  # Store filtered data here
+        # Running sum and count per field, so memory stays flat for any date range
+        self.running_averages = {
+            'max_temp': RunningAverage(),
+            'min_temp': RunningAverage(),
+            'wind_dir': RunningAverage(),
+            'wind_speed': RunningAverage()
+        }
         self.averages = None
 
+    def process_row(self, row, date):
+        """Add the fields needed for the averages from a single row in the date range."""
+        try:
+            data = {
+                'max_temp': float(row.get('Data.Temperature.Max Temp', 0.0) or 0.0),
+                'min_temp': float(row.get('Data.Temperature.Min Temp', 0.0) or 0.0),
+                'wind_dir': float(row.get('Data.Wind.Direction', 0.0) or 0.0),
+                'wind_speed': float(row.get('Data.Wind.Speed', 0.0) or 0.0)
+            }
+            for field, value in data.items():
+                self.running_averages[field].add(value)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Skipping row due to data conversion error: {e}")
+            metrics.count(f"rows_skipped.{type(self).__name__}")
+
+    def process_batch(self, batch):
+        """Add a batch of rows to the running averages with vectorized sums (numpy engine)."""
+        columns = {
+            'max_temp': 'Data.Temperature.Max Temp',
+            'min_temp': 'Data.Temperature.Min Temp',
+            'wind_dir': 'Data.Wind.Direction',
+            'wind_speed': 'Data.Wind.Speed'
+        }
+        try:
+            values = {field: batch.floats(column, 0.0) for field, column in columns.items()}
+        except ValueError:
+            # A value is not a number, let the row-by-row path skip just the bad rows
+            for row, date in batch:
+                self.process_row(row, date)
+            return
+
+        for field, column_values in values.items():
+            self.running_averages[field].add_total(column_values.sum().item(), len(column_values))
+
+    def merge(self, other):
+        """Fold the running averages of another WeatherDataProcessor into this one."""
+        for field, running_average in other.running_averages.items():
+            self.running_averages[field].merge(running_average)
+
+    def load_from_index(self, index):
+        """Take the sums and counts of the date range from a prefix-sum index instead of the rows."""
+        for field, running_average in self.running_averages.items():
+            running_average.add_total(*index.range_total(field, self.start_date, self.end_date))
+
     def read_filtered_data(self):
-        """Read the CSV file and store filtered rows."""
+        """Stream the CSV file and accumulate the filtered rows."""
+        # A prefix-sum index (see build_prefix_index.py) answers any range without reading rows
+        index = PrefixSumIndex.load(self.input_file)
+        if index:
+            self.load_from_index(index)
+            logging.info(f"Took {self.running_averages['max_temp'].count} rows of filtered data from the prefix-sum index.")
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                    except ValueError as e:
-                        logging.warning(f"Skipping row due to date parsing error: {e}")
-                        continue  # Move to the next row if date parsing fails
-
-                    if self.start_date <= date <= self.end_date:
-                        try:
-                            data = {
-                                'max_temp': float(row.get('Data.Temperature.Max Temp', 0.0) or 0.0),
-                                'min_temp': float(row.get('Data.Temperature.Min Temp', 0.0) or 0.0),
-                                'wind_dir': float(row.get('Data.Wind.Direction', 0.0) or 0.0),
-                                'wind_speed': float(row.get('Data.Wind.Speed', 0.0) or 0.0)
-                            }
-                            self.filtered_data.append(data)
-                        except (TypeError, ValueError) as e:
-                            logging.warning(f"Skipping row due to data conversion error: {e}")
-
-            logging.info(f"Finished reading and storing {len(self.filtered_data)} rows of filtered data.")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
+
+            logging.info(f"Finished reading {self.running_averages['max_temp'].count} rows of filtered data.")
 
         except FileNotFoundError:
             logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
         except Exception as e:
             logging.error(f"Unexpected error while reading file: {e}")
 
     def calculate_averages(self):
-        """Calculate averages using the filtered data."""
-        total_max_temp = total_min_temp = total_wind_dir = total_wind_speed = 0.0
-        count = len(self.filtered_data)  # Get the number of filtered data entries
+        """Calculate averages from the running sums of the filtered data."""
+        count = self.running_averages['max_temp'].count  # Get the number of filtered data entries
 
         if count == 0:
             logging.warning("No data available for the given date range.")
             self.averages = None
             return
 
-        for data in self.filtered_data:
-            total_max_temp += data['max_temp']
-            total_min_temp += data['min_temp']
-            total_wind_dir += data['wind_dir']
-            total_wind_speed += data['wind_speed']
-
         self.averages = (
-            round(total_max_temp / count, 2),
-            round(total_min_temp / count, 2),
-            round(total_wind_dir / count, 2),
-            round(total_wind_speed / count, 2)
+            round(self.running_averages['max_temp'].value, 2),
+            round(self.running_averages['min_temp'].value, 2),
+            round(self.running_averages['wind_dir'].value, 2),
+            round(self.running_averages['wind_speed'].value, 2)
         )
         logging.info(f"Calculated averages: {self.averages}")
 
@@ -93,19 +138,28 @@ class WeatherDataProcessor:
         else:
             logging.error("No data available to export.")
 
+    def report(self):
+        """Calculate and export the averages once all rows have been processed."""
+        self.calculate_averages()
+        self.export_results()
+
+    def analyze(self):
+        """Run the analysis and export the results."""
+        # Read filtered data first
+        self.read_filtered_data()
+        with metrics.phase('export'):
+            self.report()
+
 if __name__ == "__main__":
-    args_parser = ArgParser()
+    args_parser = ArgParser(allow_top=False)  # One set of averages, nothing to rank
     args = args_parser.parse_args()
 
     processor = WeatherDataProcessor(
-        args.input_file, args.output_file, args.start_date, args.end_date
+        args.input_file, args.output_file, args.start_date, args.end_date, scan_options=args_parser.scan_options(args), engine=args.engine
     )
 
-    # Read filtered data first
-    processor.read_filtered_data()
-
-    # Calculate averages using the stored filtered data
-    processor.calculate_averages()
-
-    # Export the results
-    processor.export_results()
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'avg_cal', processor.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
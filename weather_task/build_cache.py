@@ -0,0 +1,26 @@
+# Task: Convert a weather CSV into memory-mapped column files used by every analyzer
+import argparse
+import logging
+import os
+from columnar_cache import ColumnarCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Build the columnar cache for a weather CSV")
+    parser.add_argument(
+        '--input-file', type=str, required=True, help="Input CSV file with weather data"
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_file):
+        parser.error(f"Input file '{args.input_file}' does not exist.")
+
+    try:
+        cache = ColumnarCache.build(args.input_file)
+        logging.info(f"Cached {cache.row_count} rows into {cache.cache_dir}")
+        cache.close()
+    except OSError as e:
+        logging.error(f"Error building columnar cache: {e}")
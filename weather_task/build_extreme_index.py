@@ -0,0 +1,26 @@
+# Task: Build the per-day range-extreme index used for instant range maxima and minima
+import argparse
+import logging
+import os
+from extreme_index import RangeExtremeIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Build the range-extreme index of a weather CSV")
+    parser.add_argument(
+        '--input-file', type=str, required=True, help="Input CSV file with weather data"
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_file):
+        parser.error(f"Input file '{args.input_file}' does not exist.")
+
+    try:
+        index = RangeExtremeIndex.build(args.input_file)
+        index.save()
+        logging.info(f"Indexed {len(index.days)} days into {RangeExtremeIndex.index_path(args.input_file)}")
+    except OSError as e:
+        logging.error(f"Error building index: {e}")
@@ -0,0 +1,26 @@
+# Task: Build the date -> byte offset sidecar index for a date-sorted weather CSV
+import argparse
+import logging
+import os
+from date_index import DateOffsetIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Build a date index for a weather CSV sorted by Date.Full")
+    parser.add_argument(
+        '--input-file', type=str, required=True, help="Input CSV file with weather data"
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_file):
+        parser.error(f"Input file '{args.input_file}' does not exist.")
+
+    try:
+        index = DateOffsetIndex.build(args.input_file)
+        index.save()
+        logging.info(f"Indexed {len(index.dates)} dates into {DateOffsetIndex.index_path(args.input_file)}")
+    except ValueError as e:
+        logging.error(f"Error building index: {e}")
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import pickle
+from compressed_input import is_compressed
+from date_filter import to_iso
+from date_seek import complete_lines_end, read_header_end
+from row_stream import WeatherRowStream
+
+CHECKPOINT_SUFFIX = '.checkpoint'
+FINGERPRINT_SIZE = 4096  # Bytes hashed at the start and just before the checkpointed offset
+
+
+def checkpoint_path(output_file):
+    """Return the checkpoint kept next to an output file, e.g. output.csv.checkpoint."""
+    return output_file + CHECKPOINT_SUFFIX
+
+
+def fingerprint(input_file, offset):
+    """Hash the head of the file and the bytes before offset, which appends leave untouched."""
+    digest = hashlib.sha1()
+    with open(input_file, 'rb') as f:
+        digest.update(f.read(min(FINGERPRINT_SIZE, offset)))
+        f.seek(max(0, offset - FINGERPRINT_SIZE))
+        digest.update(f.read(offset - f.tell()))
+    return digest.hexdigest()
+
+
+def load_checkpoint(checkpoint_file, analyzer):
+    """Return (offset, state) saved for this analyzer and date range, or None if it cannot be reused."""
+    if not os.path.isfile(checkpoint_file):
+        return None
+
+    try:
+        with open(checkpoint_file, 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        logging.warning(f"Ignoring unreadable checkpoint {checkpoint_file}: {e}")
+        return None
+
+    expected = (type(analyzer).__name__, os.path.abspath(analyzer.input_file),
+                to_iso(analyzer.start_date), to_iso(analyzer.end_date))
+    if (saved['analyzer'], saved['input_file'], saved['start_date'], saved['end_date']) != expected:
+        logging.info(f"Checkpoint {checkpoint_file} is for another input or date range, recomputing.")
+        return None
+
+    offset = saved['offset']
+    if os.path.getsize(analyzer.input_file) < offset or fingerprint(analyzer.input_file, offset) != saved['fingerprint']:
+        logging.warning(f"{analyzer.input_file} was truncated or rewritten since the checkpoint, recomputing.")
+        return None
+
+    return offset, saved['state']
+
+
+def save_checkpoint(checkpoint_file, analyzer, offset):
+    """Save the analyzer's aggregate state and the byte offset it has consumed up to."""
+    saved = {
+        'analyzer': type(analyzer).__name__,
+        'input_file': os.path.abspath(analyzer.input_file),
+        'start_date': to_iso(analyzer.start_date),
+        'end_date': to_iso(analyzer.end_date),
+        'offset': offset,
+        'fingerprint': fingerprint(analyzer.input_file, offset),
+        'state': {field: getattr(analyzer, field) for field in analyzer.CHECKPOINT_FIELDS}
+    }
+    # Write to a temporary file first, so an interrupted run never leaves a broken checkpoint
+    with open(checkpoint_file + '.tmp', 'wb') as f:
+        pickle.dump(saved, f)
+    os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+
+def run_incremental(analyzer, checkpoint_file):
+    """Feed the analyzer only the rows appended since its checkpoint, then checkpoint again.
+
+    The analyzer lists its aggregate attributes in CHECKPOINT_FIELDS. Without a usable
+    checkpoint the whole file is read, as is a compressed input, which cannot be resumed
+    at a byte offset. Returns the number of new matching rows.
+    """
+    if is_compressed(analyzer.input_file):
+        logging.warning(f"{analyzer.input_file} is compressed, reading it in full instead of incrementally.")
+        stream = WeatherRowStream(analyzer.input_file, analyzer.start_date, analyzer.end_date)
+        stream.register(analyzer)
+        return stream.scan()
+
+    stop = complete_lines_end(analyzer.input_file)
+    saved = load_checkpoint(checkpoint_file, analyzer)
+    if saved:
+        start, state = saved
+        for field, value in state.items():
+            setattr(analyzer, field, value)
+    else:
+        start = read_header_end(analyzer.input_file)
+
+    matched = 0
+    if start < stop:
+        stream = WeatherRowStream(analyzer.input_file, analyzer.start_date, analyzer.end_date, byte_range=(start, stop))
+        stream.register(analyzer)
+        matched = stream.scan()
+    logging.info(f"Read {stop - start} new bytes of {analyzer.input_file}, {matched} matching rows.")
+
+    try:
+        save_checkpoint(checkpoint_file, analyzer, stop)
+    except OSError as e:
+        logging.error(f"Error saving checkpoint: {e}")
+    return matched
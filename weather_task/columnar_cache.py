@@ -0,0 +1,230 @@
+import bisect
+import csv
+import json
+import logging
+import math
+import mmap
+import os
+from array import array
+from datetime import datetime
+from functools import lru_cache
+from compressed_input import open_input
+from date_filter import parse_date
+from date_index import file_identity
+
+CACHE_SUFFIX = '.columns'
+BATCH_SIZE = 65536  # Rows buffered per column before they are appended to disk
+
+# Columns kept in the cache, by type
+DATE_COLUMN = 'Date.Full'
+FLOAT_COLUMNS = [
+    'Data.Temperature.Max Temp',
+    'Data.Temperature.Min Temp',
+    'Data.Temperature.Avg Temp',
+    'Data.Wind.Direction',
+    'Data.Wind.Speed'
+]
+STATION_COLUMNS = ['Station.City', 'Station.Location', 'Station.Code', 'Station.State']
+
+
+@lru_cache(maxsize=8192)
+def date_from_day(day):
+    """Return the (YYYY-MM-DD string, datetime) pair for a day number."""
+    date = datetime.fromordinal(day)
+    return date.strftime('%Y-%m-%d'), date
+
+
+def float_to_text(value):
+    """Turn a stored float32 back into the text it was read from; NaN marks a missing value."""
+    if math.isnan(value):
+        return ''
+    return '%.7g' % value
+
+
+def column_file(column):
+    """Return the file name used for a column, e.g. Data.Temperature.Max Temp -> Data.Temperature.Max_Temp.bin."""
+    return column.replace(' ', '_') + '.bin'
+
+
+class ColumnarCache:
+    """Typed, memory-mapped column files built once from the weather CSV.
+
+    Dates are stored as int32 day numbers, temperatures and wind as float32 and the
+    station fields as int32 codes into a dictionary kept in meta.json. Numbers that
+    could not be read are stored as NaN with their original text kept in meta.json, so
+    rows come back with the same text and the analyzers skip them as they do for the CSV.
+    """
+
+    def __init__(self, cache_dir, meta):
+        self.cache_dir = cache_dir
+        self.meta = meta
+        self.row_count = meta['rows']
+        self.is_sorted = meta['sorted']  # Rows are in Date.Full order, so ranges can be bisected
+        self.dictionaries = meta['dictionaries']
+        # Column -> row position -> original text of a number that could not be read
+        self.invalid = {
+            column: {int(position): text for position, text in values.items()}
+            for column, values in meta.get('invalid', {}).items()
+        }
+        self.maps = []  # Open mmap objects, closed by close()
+        self.columns = {}
+
+    @staticmethod
+    def cache_path(input_file):
+        """Return the cache directory for an input file, e.g. weather.csv.columns."""
+        return input_file + CACHE_SUFFIX
+
+    @classmethod
+    def build(cls, input_file):
+        """Convert the CSV into column files in one pass and return the opened cache."""
+        cache_dir = cls.cache_path(input_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        size, mtime = file_identity(input_file)
+
+        typecodes = {DATE_COLUMN: 'i'}
+        typecodes.update({column: 'f' for column in FLOAT_COLUMNS})
+        typecodes.update({column: 'i' for column in STATION_COLUMNS})
+        buffers = {column: array(typecodes[column]) for column in typecodes}
+        codes = {column: {} for column in STATION_COLUMNS}  # Value -> dictionary code
+        invalid = {column: {} for column in FLOAT_COLUMNS}  # Row position -> unreadable text
+
+        files = {column: open(os.path.join(cache_dir, column_file(column)), 'wb') for column in typecodes}
+        rows = 0
+        is_sorted = True
+        previous_day = 0
+        try:
+            with open_input(input_file) as csvfile:
+                for row in csv.DictReader(csvfile):
+                    try:
+                        day = parse_date(row['Date.Full']).toordinal()
+                    except ValueError as e:
+                        logging.warning(f"Skipping row due to date parsing error: {e}")
+                        continue
+
+                    is_sorted = is_sorted and day >= previous_day
+                    previous_day = day
+                    buffers[DATE_COLUMN].append(day)
+                    for column in FLOAT_COLUMNS:
+                        value = row.get(column)
+                        try:
+                            buffers[column].append(float(value) if value != '' else math.nan)
+                        except (TypeError, ValueError):
+                            buffers[column].append(math.nan)
+                            invalid[column][rows] = value  # Kept as read, e.g. 'abc' or None for a short row
+                    for column in STATION_COLUMNS:
+                        value = row.get(column, 'N/A')
+                        buffers[column].append(codes[column].setdefault(value, len(codes[column])))
+
+                    rows += 1
+                    if rows % BATCH_SIZE == 0:
+                        for column, buffer in buffers.items():
+                            buffer.tofile(files[column])
+                            del buffer[:]
+
+            for column, buffer in buffers.items():
+                buffer.tofile(files[column])
+        finally:
+            for f in files.values():
+                f.close()
+
+        meta = {
+            'size': size,
+            'mtime': mtime,
+            'rows': rows,
+            'sorted': is_sorted,
+            'typecodes': typecodes,
+            'dictionaries': {column: list(codes[column]) for column in STATION_COLUMNS},
+            'invalid': {column: values for column, values in invalid.items() if values}
+        }
+        with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        return cls(cache_dir, meta).open()
+
+    @classmethod
+    def read_meta(cls, input_file):
+        """Return the cache description of an input file, or None if it is missing or out of date."""
+        cache_dir = cls.cache_path(input_file)
+        meta_file = os.path.join(cache_dir, 'meta.json')
+        if not os.path.isfile(meta_file):
+            return None
+
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable columnar cache {cache_dir}: {e}")
+            return None
+
+        if (meta['size'], meta['mtime']) != file_identity(input_file):
+            logging.warning(f"Ignoring stale columnar cache {cache_dir}: {input_file} changed since it was built.")
+            return None
+
+        return meta
+
+    @classmethod
+    def load(cls, input_file):
+        """Open the cache of an input file, or return None if it is missing or out of date."""
+        meta = cls.read_meta(input_file)
+        if meta is None:
+            return None
+        return cls(cls.cache_path(input_file), meta).open()
+
+    def open(self):
+        """Memory-map every column file as a typed, read-only view."""
+        for column, typecode in self.meta['typecodes'].items():
+            if self.row_count == 0:
+                self.columns[column] = array(typecode)
+                continue
+            with open(os.path.join(self.cache_dir, column_file(column)), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps.append(mapped)
+            self.columns[column] = memoryview(mapped).cast(typecode)
+        return self
+
+    def close(self):
+        """Release the memory maps."""
+        for view in self.columns.values():
+            if isinstance(view, memoryview):
+                view.release()
+        for mapped in self.maps:
+            mapped.close()
+        self.columns, self.maps = {}, []
+
+    def row_positions(self, start_day, end_day):
+        """Yield the positions of the rows dated within [start_day, end_day]."""
+        days = self.columns[DATE_COLUMN]
+        if self.is_sorted:
+            yield from range(bisect.bisect_left(days, start_day), bisect.bisect_right(days, end_day))
+            return
+
+        for position, day in enumerate(days):
+            if start_day <= day <= end_day:
+                yield position
+
+    @staticmethod
+    def field_names(columns=None):
+        """Return the column names of the field tuples rows() yields: all cached columns, or those in columns."""
+        return [DATE_COLUMN] + [column for column in FLOAT_COLUMNS + STATION_COLUMNS if not columns or column in columns]
+
+    def rows(self, start_date, end_date, columns=None):
+        """Yield (fields, date) pairs for the range, fields holding the text of field_names(columns)."""
+        days = self.columns[DATE_COLUMN]
+        floats = [
+            (self.columns[column], self.invalid.get(column, {}))
+            for column in FLOAT_COLUMNS if not columns or column in columns
+        ]
+        stations = [
+            (self.columns[column], self.dictionaries[column])
+            for column in STATION_COLUMNS if not columns or column in columns
+        ]
+
+        for position in self.row_positions(start_date.toordinal(), end_date.toordinal()):
+            date_string, date = date_from_day(days[position])
+            fields = [date_string]
+            for values, invalid in floats:
+                text = float_to_text(values[position])
+                fields.append(text if text or position not in invalid else invalid[position])
+            for values, dictionary in stations:
+                fields.append(dictionary[values[position]])
+            yield tuple(fields), date
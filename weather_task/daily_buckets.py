@@ -0,0 +1,52 @@
+import bisect
+import copy
+
+
+class DailyBuckets:
+    """Stream consumer keeping one partial analyzer per day, so any date range can be answered later.
+
+    Every day gets a fresh copy of the template analyzer; a range is answered by merging
+    the partials of its days, in date order, into an analyzer built for that range.
+    Analyzers with a row_number attribute are told each row's position in the file, so
+    their ties still go to the first row in the file when the days are merged.
+    """
+
+    engine = 'python'  # Buckets are filled row by row
+
+    def __init__(self, template):
+        self.template = template  # Analyzer that has not seen any row yet
+        self.days = {}  # Date -> partial analyzer holding only that day's rows
+        self.rows = 0  # Rows seen, the position of the next one
+
+    @property
+    def COLUMNS(self):
+        """CSV columns the template analyzer reads, None if it needs whole rows."""
+        return getattr(self.template, 'COLUMNS', None)
+
+    def process_row(self, row, date):
+        """Hand a row to the partial analyzer of its day."""
+        bucket = self.days.get(date)
+        if bucket is None:
+            bucket = self.days[date] = copy.deepcopy(self.template)
+        if hasattr(bucket, 'row_number'):
+            bucket.row_number = self.rows
+        bucket.process_row(row, date)
+        self.rows += 1
+
+    def merge(self, other):
+        """Fold the days of another DailyBuckets (e.g. from a worker process), whose rows come after ours, into this one."""
+        for date, bucket in other.days.items():
+            if hasattr(bucket, 'shift_rows'):
+                bucket.shift_rows(self.rows)  # Its row positions continue ours
+            if date in self.days:
+                self.days[date].merge(bucket)
+            else:
+                self.days[date] = bucket
+        self.rows += other.rows
+
+    def answer(self, analyzer, start_date, end_date):
+        """Merge the days within [start_date, end_date] into analyzer and return it."""
+        days = sorted(self.days)
+        for date in days[bisect.bisect_left(days, start_date):bisect.bisect_right(days, end_date)]:
+            analyzer.merge(self.days[date])
+        return analyzer
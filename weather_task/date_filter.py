@@ -0,0 +1,82 @@
+import csv
+from datetime import datetime
+from functools import lru_cache
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+@lru_cache(maxsize=8192)
+def parse_date(date_string):
+    """Parse a YYYY-MM-DD string, memoized because every station repeats the same dates."""
+    return datetime.strptime(date_string, DATE_FORMAT)
+
+
+def is_iso_date(date_string):
+    """Check the YYYY-MM-DD shape, for which string order equals date order."""
+    return len(date_string) == 10 and date_string[4] == '-' and date_string[7] == '-'
+
+
+def to_iso(value):
+    """Convert a date, datetime or YYYY-MM-DD string to its YYYY-MM-DD string."""
+    if isinstance(value, str):
+        return parse_date(value).strftime(DATE_FORMAT)
+    return value.strftime(DATE_FORMAT)
+
+
+class DateRangeFilter:
+    """Filter Date.Full strings against [start_date, end_date] without parsing rows outside the range.
+
+    ISO-8601 strings sort like the dates they hold, so the range check is a plain string
+    comparison. Only rows that pass it are turned into datetime objects.
+    """
+
+    def __init__(self, start_date, end_date):
+        self.start_key = to_iso(start_date)
+        self.end_key = to_iso(end_date)
+        self.start_date = parse_date(self.start_key)
+        self.end_date = parse_date(self.end_key)
+
+    def contains_key(self, date_string):
+        """Check whether a YYYY-MM-DD string falls within the range."""
+        return self.start_key <= date_string <= self.end_key
+
+    def match(self, date_string):
+        """Return the parsed date if it falls within the range, otherwise None.
+
+        Raises ValueError if the string is not a valid date.
+        """
+        if is_iso_date(date_string):
+            if self.start_key <= date_string <= self.end_key:
+                return parse_date(date_string)
+            return None
+
+        # Unusual spellings such as 2016-1-3 take the slow path through strptime
+        date = parse_date(date_string)
+        if self.start_date <= date <= self.end_date:
+            return date
+        return None
+
+
+def read_date_ranges(ranges_file):
+    """Read a batch of date ranges, one 'start,end[,analysis,...]' line per range.
+
+    Blank lines, '#' comments and a 'start_date,end_date' header are ignored. Returns a list of
+    (start datetime, end datetime, analyses) tuples, analyses being empty for 'all of them'.
+    Raises ValueError naming the line of a malformed range.
+    """
+    ranges = []
+    with open(ranges_file, newline='') as f:
+        for line_number, fields in enumerate(csv.reader(f), start=1):
+            fields = [field.strip() for field in fields if field.strip()]
+            if not fields or fields[0].startswith('#') or fields[0] == 'start_date':
+                continue
+            if len(fields) < 2:
+                raise ValueError(f"{ranges_file}:{line_number}: expected start_date,end_date[,analysis,...]")
+            try:
+                start_date, end_date = parse_date(fields[0]), parse_date(fields[1])
+            except ValueError as e:
+                raise ValueError(f"{ranges_file}:{line_number}: {e}") from None
+            if start_date > end_date:
+                raise ValueError(f"{ranges_file}:{line_number}: start date is after end date")
+            ranges.append((start_date, end_date, tuple(fields[2:])))
+    return ranges
@@ -0,0 +1,103 @@
+import bisect
+import csv
+import json
+import logging
+import os
+from compressed_input import is_compressed
+from date_seek import read_header_end, iter_lines
+
+INDEX_SUFFIX = '.idx.json'
+
+
+def file_identity(input_file):
+    """Return the (size, mtime) pair used to tell whether a file changed."""
+    stat = os.stat(input_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DateOffsetIndex:
+    """Sidecar index mapping every Date.Full value of a date-sorted CSV to its first byte offset."""
+
+    def __init__(self, input_file, size, mtime, header_end, dates, offsets):
+        self.input_file = input_file
+        self.size = size
+        self.mtime = mtime
+        self.header_end = header_end
+        self.dates = dates  # Distinct Date.Full values in file order
+        self.offsets = offsets  # Byte offset of the first row of each date
+
+    @staticmethod
+    def index_path(input_file):
+        """Return the sidecar file name for an input file, e.g. weather.csv.idx.json."""
+        return input_file + INDEX_SUFFIX
+
+    @classmethod
+    def build(cls, input_file):
+        """Scan the CSV once and record where each date starts.
+
+        Raises ValueError if the file is not sorted by Date.Full or is compressed.
+        """
+        if is_compressed(input_file):
+            raise ValueError("Compressed inputs have no byte offsets to index, decompress the file first.")
+        size, mtime = file_identity(input_file)
+        header_end = read_header_end(input_file)
+        with open(input_file) as csvfile:
+            date_column = next(csv.reader(csvfile)).index('Date.Full')
+
+        dates, offsets = [], []
+        offset = header_end
+        for line in iter_lines(input_file, header_end):
+            date_string = next(csv.reader([line]))[date_column]
+            if not dates or date_string != dates[-1]:
+                if dates and date_string < dates[-1]:
+                    raise ValueError(f"Input is not sorted by Date.Full: {date_string} follows {dates[-1]}")
+                dates.append(date_string)
+                offsets.append(offset)
+            offset += len(line.encode())
+
+        return cls(input_file, size, mtime, header_end, dates, offsets)
+
+    def save(self):
+        """Write the index next to the input file."""
+        with open(self.index_path(self.input_file), 'w') as f:
+            json.dump({
+                'size': self.size,
+                'mtime': self.mtime,
+                'header_end': self.header_end,
+                'dates': self.dates,
+                'offsets': self.offsets
+            }, f)
+
+    @classmethod
+    def load(cls, input_file):
+        """Load the sidecar index, or return None if it is missing or out of date."""
+        path = cls.index_path(input_file)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable index {path}: {e}")
+            return None
+
+        if (data['size'], data['mtime']) != file_identity(input_file):
+            logging.warning(f"Ignoring stale index {path}: {input_file} changed since it was built.")
+            return None
+
+        return cls(input_file, data['size'], data['mtime'], data['header_end'], data['dates'], data['offsets'])
+
+    def offset_for(self, start_key):
+        """Return the byte offset of the first row dated start_key or later."""
+        position = bisect.bisect_left(self.dates, start_key)
+        if position == len(self.offsets):
+            return self.size
+        return self.offsets[position]
+
+    def offset_after(self, end_key):
+        """Return the byte offset of the first row dated after end_key."""
+        position = bisect.bisect_right(self.dates, end_key)
+        if position == len(self.offsets):
+            return self.size
+        return self.offsets[position]
@@ -0,0 +1,129 @@
+import csv
+import logging
+import os
+from date_filter import is_iso_date
+
+
+def read_header_end(input_file):
+    """Return the byte offset right after the header line."""
+    with open(input_file, 'rb') as f:
+        f.readline()
+        return f.tell()
+
+
+def iter_lines(input_file, start, stop=None):
+    """Yield the decoded lines starting at byte offset start, up to (not including) stop."""
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        while stop is None or f.tell() < stop:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode()
+
+
+def split_byte_ranges(input_file, parts, start, stop):
+    """Split [start, stop) into up to parts byte ranges that each begin at a line start."""
+    bounds = [start]
+    with open(input_file, 'rb') as f:
+        for i in range(1, parts):
+            offset = start + (stop - start) * i // parts
+            f.seek(max(offset - 1, start))
+            f.readline()  # Move to the first line starting at or after offset
+            offset = min(f.tell(), stop)
+            if offset > bounds[-1]:
+                bounds.append(offset)
+    if stop > bounds[-1]:
+        bounds.append(stop)
+    return list(zip(bounds, bounds[1:]))
+
+
+def date_at(f, offset, date_column):
+    """Read the line starting at offset and return (Date.Full value, line length in bytes)."""
+    f.seek(offset)
+    line = f.readline()
+    if not line:
+        return None, 0
+    fields = next(csv.reader([line.decode()]))
+    date_string = fields[date_column]
+    if not is_iso_date(date_string):
+        raise ValueError(f"Unexpected Date.Full value {date_string!r} at byte {offset}")
+    return date_string, len(line)
+
+
+def sample_is_sorted(input_file, date_column, samples=32):
+    """Spot-check that Date.Full never decreases across evenly spaced lines of the file."""
+    header_end = read_header_end(input_file)
+    size = os.path.getsize(input_file)
+    previous_key = ''
+    try:
+        with open(input_file, 'rb') as f:
+            for i in range(samples + 1):
+                offset = header_end + (size - header_end) * i // samples
+                if offset > header_end:
+                    f.seek(offset - 1)
+                    f.readline()  # Move to the first line starting at or after offset
+                    offset = f.tell()
+                date_string, _ = date_at(f, offset, date_column)
+                if date_string is None:
+                    break
+                if date_string < previous_key:
+                    return False
+                previous_key = date_string
+    except (IndexError, ValueError, csv.Error):
+        return False
+    return True
+
+
+def find_start_offset(input_file, date_column, start_key):
+    """Binary search a file sorted by Date.Full for the first line dated start_key or later.
+
+    Returns (header_end, offset): the byte range [header_end, offset) holds only earlier
+    dates and can be skipped. Falls back to offset == header_end if a probed line cannot
+    be read, e.g. because a quoted field spans several lines.
+    """
+    header_end = read_header_end(input_file)
+    lo, hi = header_end, os.path.getsize(input_file)  # lo is a line start, the answer lies in [lo, hi]
+
+    try:
+        with open(input_file, 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(mid)
+                f.readline()  # Move to the start of the next line
+                line_start = f.tell()
+                if line_start >= hi:
+                    break  # No line starts between mid and hi, finish linearly
+
+                date_string, _ = date_at(f, line_start, date_column)
+                if date_string < start_key:
+                    lo = line_start
+                else:
+                    hi = line_start
+
+            # Walk the last few lines from lo to the first one dated start_key or later
+            while lo < hi:
+                date_string, length = date_at(f, lo, date_column)
+                if date_string is None or date_string >= start_key:
+                    break
+                lo += length
+    except (IndexError, ValueError, csv.Error) as e:
+        logging.warning(f"Could not seek to the start date, reading from the top: {e}")
+        return header_end, header_end
+
+    return header_end, lo
+
+
+def complete_lines_end(input_file, block_size=65536):
+    """Return the byte offset right after the last newline, leaving out a line still being appended."""
+    size = os.path.getsize(input_file)
+    with open(input_file, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            position = f.read(end - start).rfind(b'\n')
+            if position != -1:
+                return start + position + 1
+            end = start
+    return 0
@@ -0,0 +1,186 @@
+import bisect
+import csv
+import json
+import logging
+import os
+from compressed_input import open_input
+from date_filter import parse_date
+from date_index import file_identity
+
+EXTREMES_SUFFIX = '.extremes.json'
+
+MAX_TEMP = 'Data.Temperature.Max Temp'
+MIN_TEMP = 'Data.Temperature.Min Temp'
+WIND_SPEED = 'Data.Wind.Speed'
+STATION_COLUMNS = ['Station.City', 'Station.Location', 'Station.Code', 'Station.State']
+
+# Analyzer -> (empty values count as 0.0, [(measure, column, mode), ...]).
+# A row with an unreadable value is skipped for every measure of its analyzer, as in process_row.
+GROUPS = {
+    'highest_temp_day': (True, [('max_temp', MAX_TEMP, 'max')]),
+    'max_temp_state': (False, [('max_temp', MAX_TEMP, 'max')]),
+    'max_min_state_temp': (False, [
+        ('max_temp', MAX_TEMP, 'max'),
+        ('max_wind', WIND_SPEED, 'max'),
+        ('min_temp', MIN_TEMP, 'min'),
+        ('min_wind', WIND_SPEED, 'min')
+    ])
+}
+
+
+def read_value(row, column, empty_as_zero):
+    """Convert a column like the analyzers do: a missing key is 0.0, an empty value 0.0 or an error."""
+    value = row.get(column)
+    if value is None or (value == '' and empty_as_zero):
+        return 0.0
+    return float(value)
+
+
+class RangeExtremeIndex:
+    """Per-day maxima and minima with the station holding them, persisted next to the input.
+
+    A sparse table over the days, built once with the index and saved with it, answers the
+    extreme of any date range with two lookups. Every entry keeps the row number of its
+    winner, so ties go to the row that comes first in the file, exactly like a scan.
+    """
+
+    def __init__(self, input_file, size, mtime, days, stations, extremes, tables):
+        self.input_file = input_file
+        self.size = size
+        self.mtime = mtime
+        self.days = days  # Sorted day numbers (date.toordinal()) that have rows
+        self.stations = stations  # [city, location, code, state] lists, referenced by position
+        self.extremes = extremes  # 'analyzer.measure' -> per-day [value, Date.Full, station, row] or None
+        self.tables = tables  # 'analyzer.measure' -> sparse table, see sparse_table()
+
+    @staticmethod
+    def index_path(input_file):
+        """Return the sidecar file name for an input file, e.g. weather.csv.extremes.json."""
+        return input_file + EXTREMES_SUFFIX
+
+    @classmethod
+    def build(cls, input_file):
+        """Scan the CSV once, in any row order, and keep the extremes of every day."""
+        size, mtime = file_identity(input_file)
+        station_ids = {}  # (city, location, code, state) -> position in the stations list
+        daily = {}  # Day number -> {'analyzer.measure': [value, Date.Full, station, row]}
+
+        with open_input(input_file) as csvfile:
+            for row_number, row in enumerate(csv.DictReader(csvfile)):
+                try:
+                    day = parse_date(row['Date.Full']).toordinal()
+                except ValueError as e:
+                    logging.warning(f"Skipping row due to date parsing error: {e}")
+                    continue
+
+                day_extremes = daily.setdefault(day, {})
+                station = None
+                for group, (empty_as_zero, measures) in GROUPS.items():
+                    try:
+                        values = [read_value(row, column, empty_as_zero) for _, column, _ in measures]
+                    except ValueError:
+                        continue  # The analyzer skips this row
+
+                    for (measure, _, mode), value in zip(measures, values):
+                        key = f"{group}.{measure}"
+                        best = day_extremes.get(key)
+                        if best is None or (value > best[0] if mode == 'max' else value < best[0]):
+                            if station is None:
+                                fields = tuple(row.get(column, 'N/A') for column in STATION_COLUMNS)
+                                station = station_ids.setdefault(fields, len(station_ids))
+                            day_extremes[key] = [value, row['Date.Full'], station, row_number]
+
+        days = sorted(daily)
+        keys = [f"{group}.{measure}" for group, (_, measures) in GROUPS.items() for measure, _, _ in measures]
+        extremes = {key: [daily[day].get(key) for day in days] for key in keys}
+        tables = {key: cls.sparse_table(extremes[key], cls.mode_of(key)) for key in keys}
+        return cls(input_file, size, mtime, days, [list(fields) for fields in station_ids], extremes, tables)
+
+    def save(self):
+        """Write the index next to the input file."""
+        with open(self.index_path(self.input_file), 'w') as f:
+            json.dump({
+                'size': self.size,
+                'mtime': self.mtime,
+                'days': self.days,
+                'stations': self.stations,
+                'extremes': self.extremes,
+                'tables': self.tables
+            }, f)
+
+    @classmethod
+    def load(cls, input_file):
+        """Load the range-extreme index, or return None if it is missing or out of date."""
+        path = cls.index_path(input_file)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable extremes index {path}: {e}")
+            return None
+
+        if (data['size'], data['mtime']) != file_identity(input_file):
+            logging.warning(f"Ignoring stale extremes index {path}: {input_file} changed since it was built.")
+            return None
+
+        if 'tables' not in data:
+            logging.warning(f"Ignoring extremes index {path} without sparse tables: rebuild it with build_extreme_index.py.")
+            return None
+
+        return cls(input_file, data['size'], data['mtime'], data['days'], data['stations'], data['extremes'], data['tables'])
+
+    @staticmethod
+    def mode_of(key):
+        """Return 'max' or 'min' for an 'analyzer.measure' key."""
+        group, measure = key.split('.')
+        return next(mode for name, _, mode in GROUPS[group][1] if name == measure)
+
+    @classmethod
+    def sparse_table(cls, entries, mode):
+        """Return the sparse table of a measure: table[k][i] is the best day in [i, i + 2**k)."""
+        better = cls.better_day(entries, mode)
+        levels = [list(range(len(entries)))]
+        width = 1
+        while 2 * width <= len(entries):
+            previous = levels[-1]
+            levels.append([better(previous[i], previous[i + width]) for i in range(len(entries) - 2 * width + 1)])
+            width *= 2
+        return levels
+
+    @staticmethod
+    def better_day(entries, mode):
+        """Return a function picking the better of two day positions, the one holding the earlier row on ties."""
+        def better(first, second):
+            if entries[second] is None:
+                return first
+            if entries[first] is None:
+                return second
+            if entries[second][0] == entries[first][0]:
+                return second if entries[second][3] < entries[first][3] else first
+            if mode == 'max':
+                return second if entries[second][0] > entries[first][0] else first
+            return second if entries[second][0] < entries[first][0] else first
+        return better
+
+    def extreme(self, group, measure, start_date, end_date):
+        """Return (value, Date.Full, [city, location, code, state]) for the range, or None if it has no rows."""
+        key = f"{group}.{measure}"
+        first = bisect.bisect_left(self.days, start_date.toordinal())
+        last = bisect.bisect_right(self.days, end_date.toordinal())
+        if first >= last:
+            return None
+
+        levels = self.tables[key]
+        level = (last - first).bit_length() - 1
+        # Two overlapping windows of 2**level days cover [first, last)
+        day = self.better_day(self.extremes[key], self.mode_of(key))(
+            levels[level][first], levels[level][last - (1 << level)]
+        )
+        entry = self.extremes[key][day]
+        if entry is None:
+            return None
+        value, date_string, station, _ = entry
+        return value, date_string, self.stations[station]
@@ -3,67 +3,115 @@ import csv
 import logging
 from datetime import datetime
 from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from metrics import metrics
+from result_cache import run_cached
+from numpy_engine import top_indices
+from accumulators import running_extreme
+from records import STATION_COLUMNS, Observation, station_of, station_record
+from extreme_index import RangeExtremeIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class HighestTemperatureFinder:
-    def __init__(self, input_file: str, start_date: datetime, end_date: datetime, output_file: str):
+    COLUMNS = ['Data.Temperature.Max Temp'] + STATION_COLUMNS  # CSV columns read from each row
+    row_number = None  # Position in the file of the row being processed, set by DailyBuckets
+
+    def __init__(self, input_file: str, start_date: datetime, end_date: datetime, output_file: str, scan_options: dict = None, engine: str = 'python', top: int = 1):
         self.input_file = input_file
         self.start_date = start_date
         self.end_date = end_date
         self.output_file = output_file
-        self.filtered_data = []  # Store filtered data here
-        self.highest_temp_info = None
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
+        self.top = top  # Number of hottest days to report
+        self.highest = running_extreme('max', top)  # Running maximum (or top k) over the filtered rows
+        self.highest_temp_info = []  # One dict per reported day, hottest first
+
+    def process_row(self, row, date):
+        """Update the running maximum with a single row in the date range."""
+        try:
+            max_temp = float(row.get('Data.Temperature.Max Temp', 0.0) or 0.0)
+            # Only build a record for a new maximum, most rows just bump the count
+            if self.highest.is_better(max_temp):
+                self.highest.add(max_temp, Observation(row['Date.Full'], station_of(row)), position=self.row_number)
+            else:
+                self.highest.count += 1
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Skipping row due to data conversion error: {e}")
+            metrics.count(f"rows_skipped.{type(self).__name__}")
+
+    def process_batch(self, batch):
+        """Update the running maximum with the argmax (or top k) of a batch of rows (numpy engine)."""
+        try:
+            max_temps = batch.floats('Data.Temperature.Max Temp', 0.0)
+        except ValueError:
+            # A value is not a number, let the row-by-row path skip just the bad rows
+            for row, date in batch:
+                self.process_row(row, date)
+            return
+
+        for position in top_indices(max_temps, self.top):
+            row = batch.row(position)
+            self.highest.add(max_temps[position].item(), Observation(row['Date.Full'], station_of(row)), count=0)
+        self.highest.count += len(batch)
+
+    def merge(self, other):
+        """Fold the running maximum of another HighestTemperatureFinder into this one."""
+        self.highest.merge(other.highest)
+
+    def shift_rows(self, offset):
+        """Move the row positions kept for tie-breaking by offset."""
+        self.highest.shift(offset)
+
+    def load_from_index(self, index):
+        """Take the highest temperature of the date range from a range-extreme index instead of the rows."""
+        extreme = index.extreme('highest_temp_day', 'max_temp', self.start_date, self.end_date)
+        if extreme is not None:
+            value, date_string, station = extreme
+            self.highest.add(value, Observation(date_string, station_record(*station)), count=0)
 
     def read_filtered_data(self):
-        """Read the CSV file and store relevant rows with valid data."""
+        """Stream the CSV file and track the highest temperature of the valid rows."""
+        # A range-extreme index (see build_extreme_index.py) answers any range without reading rows;
+        # it only keeps the best row of each day, so --top runs scan
+        index = RangeExtremeIndex.load(self.input_file) if self.top == 1 else None
+        if index:
+            self.load_from_index(index)
+            logging.info("Took the highest temperature from the range-extreme index.")
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                    except ValueError as e:
-                        logging.warning(f"Skipping row due to date parsing error: {e}")
-                        continue  # Skip this row if date parsing fails
-
-                    if self.start_date <= date <= self.end_date:
-                        try:
-                            data = {
-                                'date': row['Date.Full'],
-                                'max_temp': float(row.get('Data.Temperature.Max Temp', 0.0) or 0.0),
-                                'city': row.get('Station.City', 'N/A'),
-                                'state': row.get('Station.State', 'N/A')
-                            }
-                            self.filtered_data.append(data)
-                        except (TypeError, ValueError) as e:
-                            logging.warning(f"Skipping row due to data conversion error: {e}")
-
-            logging.info(f"Finished reading and storing {len(self.filtered_data)} rows of filtered data.")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
+
+            logging.info(f"Finished reading {self.highest.count} rows of filtered data.")
 
         except FileNotFoundError:
             logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
         except Exception as e:
             logging.error(f"Unexpected error while reading file: {e}")
 
     def find_highest_temperature(self):
-        """Identify the highest temperature from the filtered data."""
-        max_temp = float('-inf')  # Initialize max_temp to a very low value
-
-        for data in self.filtered_data:
-            if data['max_temp'] > max_temp:
-                max_temp = data['max_temp']
-                self.highest_temp_info = {
-                    'Date': data['date'],
-                    'MaxTemperature': max_temp,
-                    'City': data['city'],
-                    'State': data['state']
-                }
-
-        if self.highest_temp_info:
-            logging.info(f"Highest temperature found: {self.highest_temp_info}")
-        else:
+        """Identify the highest temperatures from the running maximum (or top k)."""
+        self.highest_temp_info = [
+            {
+                'Date': observation.date,
+                'MaxTemperature': max_temp,
+                'City': observation.station.city,
+                'State': observation.station.state
+            }
+            for max_temp, observation in self.highest.items()
+        ]
+
+        for info in self.highest_temp_info:
+            logging.info(f"Highest temperature found: {info}")
+        if not self.highest_temp_info:
             logging.warning("No valid data found in the specified date range.")
 
     def export_to_csv(self):
@@ -76,12 +124,8 @@ class HighestTemperatureFinder:
             with open(self.output_file, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['Date', 'MaxTemperature', 'City', 'State'])  # Write header
-                writer.writerow([
-                    self.highest_temp_info['Date'],
-                    self.highest_temp_info['MaxTemperature'],
-                    self.highest_temp_info['City'],
-                    self.highest_temp_info['State']
-                ])  # Write data
+                for info in self.highest_temp_info:
+                    writer.writerow([info['Date'], info['MaxTemperature'], info['City'], info['State']])  # Write data
 
             logging.info(f"Results successfully exported to {self.output_file}")
 
@@ -90,11 +134,16 @@ class HighestTemperatureFinder:
         except Exception as e:
             logging.error(f"Error exporting results: {e}")
 
+    def report(self):
+        """Find and export the highest temperature once all rows have been processed."""
+        self.find_highest_temperature()
+        self.export_to_csv()
+
     def analyze(self):
         """Run the analysis and export the results."""
         self.read_filtered_data()
-        self.find_highest_temperature()
-        self.export_to_csv()
+        with metrics.phase('export'):
+            self.report()
 
 if __name__ == "__main__":
     # Parse command-line arguments
@@ -103,8 +152,12 @@ if __name__ == "__main__":
 
     # Create an instance of HighestTemperatureFinder
     temp_finder = HighestTemperatureFinder(
-        args.input_file, args.start_date, args.end_date, args.output_file
+        args.input_file, args.start_date, args.end_date, args.output_file, scan_options=arg_parser.scan_options(args), engine=args.engine,
+        top=args.top
     )
 
-    # Run the analysis
-    temp_finder.analyze()
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'highest_temp_day', temp_finder.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
@@ -1,72 +1,122 @@
 # Task: Find the year with lowest temperature average
 import csv
+import heapq
 import logging
-from datetime import datetime
-from collections import defaultdict
 from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from checkpoint import run_incremental
+from metrics import metrics
+from result_cache import run_cached
+from numpy_engine import grouped_sums
+from accumulators import grouped_averages, merge_grouped_averages
+from prefix_index import PrefixSumIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class LowestTemperatureAverageFinder:
-    def __init__(self, input_file, start_date, end_date, output_file):
+    COLUMNS = ['Data.Temperature.Avg Temp']  # CSV columns read from each row
+
+    CHECKPOINT_FIELDS = ['yearly_data']  # Aggregate state saved by incremental runs
+
+    def __init__(self, input_file, start_date, end_date, output_file, scan_options=None, engine='python', checkpoint_file=None, top=1):
         self.input_file = input_file
         self.start_date = start_date
         self.end_date = end_date
         self.output_file = output_file
-        self.filtered_data = defaultdict(list)  # Store temperatures by year
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
+        self.checkpoint_file = checkpoint_file  # Set for --incremental runs, see checkpoint.py
+        self.top = top  # Number of years to report
+        self.yearly_data = grouped_averages()  # Running average temperature by year
+
+    def process_row(self, row, date):
+        """Add the average temperature of a single row to its year."""
+        try:
+            # Store only relevant fields
+            data = {
+                'year': date.year,
+                'avg_temp': float(row.get('Data.Temperature.Avg Temp', 0.0) or 0.0)
+            }
+            self.yearly_data[data['year']].add(data['avg_temp'])
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Skipping row due to data conversion error: {e}")
+            metrics.count(f"rows_skipped.{type(self).__name__}")
+
+    def process_batch(self, batch):
+        """Add a batch of rows to the yearly running averages with np.bincount (numpy engine)."""
+        try:
+            avg_temps = batch.floats('Data.Temperature.Avg Temp', 0.0)
+        except ValueError:
+            # A value is not a number, let the row-by-row path skip just the bad rows
+            for row, date in batch:
+                self.process_row(row, date)
+            return
+
+        for year, total, count in grouped_sums(batch.years(), avg_temps):
+            self.yearly_data[year].add_total(total, count)
+
+    def merge(self, other):
+        """Fold the yearly running averages of another LowestTemperatureAverageFinder into this one."""
+        merge_grouped_averages(self.yearly_data, other.yearly_data)
+
+    def load_from_index(self, index):
+        """Take the yearly sums and counts of the date range from a prefix-sum index instead of the rows."""
+        for year, total, count in index.yearly_totals('avg_temp', self.start_date, self.end_date):
+            self.yearly_data[year].add_total(total, count)
 
     def read_filtered_data(self):
-        """Read the CSV file and store filtered rows with relevant data."""
+        """Stream the CSV file and accumulate the filtered rows by year."""
+        if self.checkpoint_file:
+            # Only the rows appended since the last run are read
+            try:
+                run_incremental(self, self.checkpoint_file)
+            except FileNotFoundError:
+                logging.error(f"Error: File {self.input_file} not found.")
+            except MissingColumnError:
+                raise  # The input cannot answer this analysis, reported by the caller
+            except Exception as e:
+                logging.error(f"Unexpected error while reading file: {e}")
+            return
+
+        # A prefix-sum index (see build_prefix_index.py) answers any range with a lookup per year
+        index = PrefixSumIndex.load(self.input_file)
+        if index:
+            self.load_from_index(index)
+            logging.info(f"Took temperatures from {len(self.yearly_data)} years from the prefix-sum index.")
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)  # Read CSV in key-value pairs
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                    except ValueError as e:
-                        logging.warning(f"Skipping row due to date parsing error: {e}")
-                        continue  # Skip if date parsing fails
-
-                    if self.start_date <= date <= self.end_date:
-                        try:
-                            # Store only relevant fields
-                            data = {
-                                'year': date.year,
-                                'avg_temp': float(row.get('Data.Temperature.Avg Temp', 0.0) or 0.0)
-                            }
-                            self.filtered_data[data['year']].append(data['avg_temp'])
-                        except (TypeError, ValueError) as e:
-                            logging.warning(f"Skipping row due to data conversion error: {e}")
-
-            logging.info(f"Finished reading data with temperatures from {len(self.filtered_data)} years.")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
+
+            logging.info(f"Finished reading data with temperatures from {len(self.yearly_data)} years.")
 
         except FileNotFoundError:
             logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
         except Exception as e:
             logging.error(f"Unexpected error while reading file: {e}")
 
     def calculate_lowest_average_temperature(self):
-        """Find the year with the lowest average temperature."""
-        lowest_avg_temp_year = None
-        lowest_avg_temp_value = float('inf')
-
-        for year, temps in self.filtered_data.items():
-            avg_temp = sum(temps) / len(temps)  # Calculate average temperature
-            if avg_temp < lowest_avg_temp_value:
-                lowest_avg_temp_value = avg_temp
-                lowest_avg_temp_year = year
+        """Find the years with the lowest average temperature, coldest first."""
+        # Average temperature of each year; nsmallest keeps a heap of only self.top years
+        yearly_averages = ((year, running_average.value) for year, running_average in self.yearly_data.items())
+        lowest_years = heapq.nsmallest(self.top, yearly_averages, key=lambda item: item[1])
 
-        if lowest_avg_temp_year is not None:
+        for lowest_avg_temp_year, lowest_avg_temp_value in lowest_years:
             logging.info(f"Year with lowest average temperature: {lowest_avg_temp_year} ({lowest_avg_temp_value:.2f}°C)")
-        else:
+        if not lowest_years:
             logging.warning("No valid data found for the given date range.")
 
-        return lowest_avg_temp_year, lowest_avg_temp_value
+        return lowest_years  # [(year, avgTemp), ...]
 
-    def export_results(self, year, avg_temp):
+    def export_results(self, years):
         """Export the results to a CSV file."""
-        if year is None:
+        if not years:
             logging.error("No data to export.")
             return
 
@@ -74,7 +124,8 @@ class LowestTemperatureAverageFinder:
             with open(self.output_file, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['Year', 'LowestAverageTemperature'])  # Write header
-                writer.writerow([year, f"{avg_temp:.2f}"])  # Write data
+                for year, avg_temp in years:
+                    writer.writerow([year, f"{avg_temp:.2f}"])  # Write data
 
             logging.info(f"Results successfully exported to {self.output_file}")
 
@@ -83,21 +134,29 @@ class LowestTemperatureAverageFinder:
         except Exception as e:
             logging.error(f"Error exporting results: {e}")
 
+    def report(self):
+        """Find and export the lowest yearly averages once all rows have been processed."""
+        self.export_results(self.calculate_lowest_average_temperature())
+
     def analyze(self):
         """Run the analysis and export the results."""
         self.read_filtered_data()
-        year, avg_temp = self.calculate_lowest_average_temperature()
-        self.export_results(year, avg_temp)
+        with metrics.phase('export'):
+            self.report()
 
 if __name__ == "__main__":
     # Parse command-line arguments
-    arg_parser = ArgParser()
+    arg_parser = ArgParser(allow_incremental=True)
     args = arg_parser.parse_args()
 
     # Create an instance of LowestTemperatureAverageFinder
     temp_finder = LowestTemperatureAverageFinder(
-        args.input_file, args.start_date, args.end_date, args.output_file
+        args.input_file, args.start_date, args.end_date, args.output_file, scan_options=arg_parser.scan_options(args), engine=args.engine,
+        checkpoint_file=arg_parser.checkpoint_file(args), top=args.top
     )
 
-    # Run the analysis
-    temp_finder.analyze()
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'lowest_avg_temp_year', temp_finder.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
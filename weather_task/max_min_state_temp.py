@@ -1,99 +1,153 @@
 # Task: Find the state with maximum temperature, maximum wind speed, minimum temperature, and minimum wind speed
 import csv
 import logging
-from datetime import datetime
 from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from metrics import metrics
+from result_cache import run_cached
+from numpy_engine import np, top_indices
+from accumulators import running_extreme
+from records import STATION_COLUMNS, station_of, station_record
+from extreme_index import RangeExtremeIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class StateWeatherAnalyzer:
-    def __init__(self, input_file, start_date, end_date, output_file):
+    COLUMNS = ['Data.Temperature.Max Temp', 'Data.Temperature.Min Temp', 'Data.Wind.Speed'] + STATION_COLUMNS  # CSV columns read from each row
+    row_number = None  # Position in the file of the row being processed, set by DailyBuckets
+
+    def __init__(self, input_file, start_date, end_date, output_file, scan_options=None, engine='python', top=1):
         self.input_file = input_file
         self.start_date = start_date
         self.end_date = end_date
         self.output_file = output_file
-        self.filtered_data = []  # Store relevant rows with necessary data
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
+        self.top = top  # Number of stations to report per category
+        # Running extremes (or top k) over the filtered rows, each keeping the station that holds it
+        self.max_temp = running_extreme('max', top)
+        self.max_wind = running_extreme('max', top)
+        self.min_temp = running_extreme('min', top)
+        self.min_wind = running_extreme('min', top)
+
+    def process_row(self, row, date):
+        """Update the running extremes with a single row in the date range."""
+        try:
+            max_temp = row.get('Data.Temperature.Max Temp')
+            min_temp = row.get('Data.Temperature.Min Temp')
+            wind_speed = row.get('Data.Wind.Speed')
+
+            # Fill missing values with 0.0 and convert to float
+            max_temp = float(max_temp) if max_temp is not None else 0.0
+            min_temp = float(min_temp) if min_temp is not None else 0.0
+            wind_speed = float(wind_speed) if wind_speed is not None else 0.0
+
+            # Keep the shared station record rather than a new dict per row
+            station = station_of(row)
+            self.max_temp.add(max_temp, station, position=self.row_number)
+            self.max_wind.add(wind_speed, station, position=self.row_number)
+            self.min_temp.add(min_temp, station, position=self.row_number)
+            self.min_wind.add(wind_speed, station, position=self.row_number)
+        except ValueError as e:
+            logging.warning(f"Skipping row due to data conversion error: {e}")
+            metrics.count(f"rows_skipped.{type(self).__name__}")
+
+    def process_batch(self, batch):
+        """Update the running extremes with the argmax/argmin (or top k) of a batch of rows (numpy engine)."""
+        try:
+            # Empty values become NaN and those rows are skipped, like in process_row
+            max_temps = batch.floats('Data.Temperature.Max Temp', np.nan)
+            min_temps = batch.floats('Data.Temperature.Min Temp', np.nan)
+            wind_speeds = batch.floats('Data.Wind.Speed', np.nan)
+        except ValueError:
+            # A value is not a number, let the row-by-row path skip just the bad rows
+            for row, date in batch:
+                self.process_row(row, date)
+            return
+
+        valid = ~(np.isnan(max_temps) | np.isnan(min_temps) | np.isnan(wind_speeds))
+        count = int(valid.sum())
+        for extreme, values, largest in [
+            (self.max_temp, max_temps, True),
+            (self.max_wind, wind_speeds, True),
+            (self.min_temp, min_temps, False),
+            (self.min_wind, wind_speeds, False)
+        ]:
+            for position in top_indices(values, self.top, valid, largest):
+                extreme.add(values[position].item(), station_of(batch.row(position)), count=0)
+            extreme.count += count
+
+    def merge(self, other):
+        """Fold the running extremes of another StateWeatherAnalyzer into this one."""
+        self.max_temp.merge(other.max_temp)
+        self.max_wind.merge(other.max_wind)
+        self.min_temp.merge(other.min_temp)
+        self.min_wind.merge(other.min_wind)
+
+    def shift_rows(self, offset):
+        """Move the row positions kept for tie-breaking by offset."""
+        for extreme in (self.max_temp, self.max_wind, self.min_temp, self.min_wind):
+            extreme.shift(offset)
+
+    def load_from_index(self, index):
+        """Take the four extremes of the date range from a range-extreme index instead of the rows."""
+        for measure, extreme in [
+            ('max_temp', self.max_temp),
+            ('max_wind', self.max_wind),
+            ('min_temp', self.min_temp),
+            ('min_wind', self.min_wind)
+        ]:
+            result = index.extreme('max_min_state_temp', measure, self.start_date, self.end_date)
+            if result is not None:
+                value, _, station = result
+                extreme.add(value, station_record(*station), count=0)
 
     def read_filtered_data(self):
-        """Read the CSV file and store relevant rows within the specified date range."""
+        """Stream the CSV file and track the extremes within the specified date range."""
+        # A range-extreme index (see build_extreme_index.py) answers any range without reading rows;
+        # it only keeps the best row of each day, so --top runs scan
+        index = RangeExtremeIndex.load(self.input_file) if self.top == 1 else None
+        if index:
+            self.load_from_index(index)
+            logging.info("Took the extreme values from the range-extreme index.")
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)  # Read data in key-value pairs
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                        if self.start_date <= date <= self.end_date:
-                            # Store only relevant fields, filling missing values with 0.0
-                            max_temp = row.get('Data.Temperature.Max Temp')
-                            min_temp = row.get('Data.Temperature.Min Temp')
-                            wind_speed = row.get('Data.Wind.Speed')
-
-                            # Fill missing values with 0.0 and convert to float
-                            data = {
-                                'city': row.get('Station.City', 'N/A'),
-                                'location': row.get('Station.Location', 'N/A'),
-                                'code': row.get('Station.Code', 'N/A'),
-                                'state': row.get('Station.State', 'N/A'),
-                                'max_temp': float(max_temp) if max_temp is not None else 0.0,
-                                'min_temp': float(min_temp) if min_temp is not None else 0.0,
-                                'wind_speed': float(wind_speed) if wind_speed is not None else 0.0
-                            }
-                            self.filtered_data.append(data)
-                    except ValueError as e:
-                        logging.warning(f"Skipping row due to date parsing error: {e}")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
         except FileNotFoundError:
             logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
         except Exception as e:
             logging.error(f"Unexpected error while reading file: {e}")
 
     def find_extreme_values(self):
         """Find the states with maximum/minimum temperature and wind speed."""
-        max_temp = max_wind = float('-inf') 
-        min_temp = min_wind = float('inf')
-
-        max_temp_row = max_wind_row = min_temp_row = min_wind_row = None  # Store rows with extreme values
-
-        for row in self.filtered_data:  # Iterate over relevant rows
-            # Extract relevant values from filtered data
-            temp_max = row['max_temp']
-            temp_min = row['min_temp']
-            wind_speed = row['wind_speed']
-
-            # Update max temperature and store corresponding row
-            if temp_max > max_temp:
-                max_temp = temp_max
-                max_temp_row = row
-            # Update min temperature and store corresponding row
-            if temp_min < min_temp:
-                min_temp = temp_min
-                min_temp_row = row
-            # Update max wind speed and store corresponding row
-            if wind_speed > max_wind:
-                max_wind = wind_speed
-                max_wind_row = row
-            # Update min wind speed and store corresponding row
-            if wind_speed < min_wind:
-                min_wind = wind_speed
-                min_wind_row = row
-
-        return max_temp_row, max_wind_row, min_temp_row, min_wind_row
+        # Stations with extreme values, best first; empty if no row was seen
+        return [
+            [station for _, station in extreme.items()]
+            for extreme in (self.max_temp, self.max_wind, self.min_temp, self.min_wind)
+        ]
 
     def extract_data(self, rows):
         """Extract relevant information from the given rows."""
         categories = ['Max Temperature', 'Max Wind Speed', 'Min Temperature', 'Min Wind Speed']
         data = []  # List to store extracted data for each category
 
-        for category, row in zip(categories, rows):  # Combine categories with corresponding rows
-            if row:
+        for category, stations in zip(categories, rows):  # Combine categories with corresponding stations
+            for station in stations:
                 data.append([      
                     category,
-                    row['city'],
-                    row['location'],
-                    row['code'],
-                    row['state']
+                    station.city,
+                    station.location,
+                    station.code,
+                    station.state
                 ])
-            else:
+            if not stations:
                 logging.warning(f"No data available for {category}.")
                 data.append([category, 'N/A', 'N/A', 'N/A', 'N/A'])
 
@@ -111,21 +165,30 @@ class StateWeatherAnalyzer:
         except Exception as e:
             logging.error(f"Error exporting results: {e}")
 
-    def analyze(self):
-        """Run the analysis and export the results."""
-        self.read_filtered_data()
+    def report(self):
+        """Find and export the extreme values once all rows have been processed."""
         rows = self.find_extreme_values()
         data = self.extract_data(rows)
         logging.info(f"Result is: {data}")
         self.export_to_csv(data)
 
+    def analyze(self):
+        """Run the analysis and export the results."""
+        self.read_filtered_data()
+        with metrics.phase('export'):
+            self.report()
+
 if __name__ == "__main__":
     # Parse command-line arguments
     arg_parser = ArgParser()
     args = arg_parser.parse_args()
 
     # Create an instance of StateWeatherAnalyzer
-    analyzer = StateWeatherAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file)
-
-    # Run the analysis
-    analyzer.analyze()
+    analyzer = StateWeatherAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file, scan_options=arg_parser.scan_options(args), engine=args.engine,
+        top=args.top)
+
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'max_min_state_temp', analyzer.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
@@ -1,112 +1,150 @@
 import csv
+import heapq
 import logging
-from datetime import datetime
 from ArgParser_class import ArgParser
-from collections import defaultdict
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from checkpoint import run_incremental
+from metrics import metrics
+from result_cache import run_cached
+from numpy_engine import np, grouped_sums
+from accumulators import grouped_averages, merge_grouped_averages
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class MonthlyTemperatureAnalyzer:
-    def __init__(self, input_file, start_date, end_date, output_file):
+    COLUMNS = ['Data.Temperature.Avg Temp']  # CSV columns read from each row
+
+    CHECKPOINT_FIELDS = ['monthly_data']  # Aggregate state saved by incremental runs
+
+    def __init__(self, input_file, start_date, end_date, output_file, scan_options=None, engine='python', checkpoint_file=None, top=1):
         self.input_file = input_file
         self.start_date = start_date
         self.end_date = end_date
         self.output_file = output_file
-        self.filtered_data = []  # Store relevant rows with necessary data
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
+        self.checkpoint_file = checkpoint_file  # Set for --incremental runs, see checkpoint.py
+        self.top = top  # Number of months to report
+        self.monthly_data = grouped_averages()  # Running average temperature by (year, month)
+
+    def process_row(self, row, date):
+        """Add the average temperature of a single row to its month."""
+        try:
+            # Read the average temperature, filling missing values with 0.0
+            avg_temp = row.get('Data.Temperature.Avg Temp')
+
+            # Fill missing values with 0.0 and convert to float
+            avg_temp = float(avg_temp) if avg_temp is not None else 0.0
+
+            # Store temperature data indexed by year and month
+            self.monthly_data[(date.year, date.month)].add(avg_temp)
+        except ValueError as e:
+            logging.warning(f"Skipping row due to data conversion error: {e}")
+            metrics.count(f"rows_skipped.{type(self).__name__}")
+
+    def process_batch(self, batch):
+        """Add a batch of rows to the monthly running averages with np.bincount (numpy engine)."""
+        try:
+            # Empty values become NaN and those rows are skipped, like in process_row
+            avg_temps = batch.floats('Data.Temperature.Avg Temp', np.nan)
+        except ValueError:
+            # A value is not a number, let the row-by-row path skip just the bad rows
+            for row, date in batch:
+                self.process_row(row, date)
+            return
+
+        valid = ~np.isnan(avg_temps)
+        for key, total, count in grouped_sums(batch.months()[valid], avg_temps[valid]):
+            self.monthly_data[(key // 12, key % 12 + 1)].add_total(total, count)
+
+    def merge(self, other):
+        """Fold the monthly running averages of another MonthlyTemperatureAnalyzer into this one."""
+        merge_grouped_averages(self.monthly_data, other.monthly_data)
 
     def read_filtered_data(self):
-        """Read the CSV file and store relevant rows within the specified date range."""
+        """Stream the CSV file and accumulate the rows within the specified date range."""
+        if self.checkpoint_file:
+            # Only the rows appended since the last run are read
+            try:
+                run_incremental(self, self.checkpoint_file)
+            except FileNotFoundError:
+                logging.error(f"Error: File {self.input_file} not found.")
+            except MissingColumnError:
+                raise  # The input cannot answer this analysis, reported by the caller
+            except Exception as e:
+                logging.error(f"Unexpected error while reading file: {e}")
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)  # Read data in key-value pairs
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                        if self.start_date <= date <= self.end_date:
-                            # Store only relevant fields, filling missing average temperature with 0.0
-                            avg_temp = row.get('Data.Temperature.Avg Temp')
-
-                            # Fill missing values with 0.0 and convert to float
-                            data = {
-                                'date': date,
-                                'avg_temp': float(avg_temp) if avg_temp is not None else 0.0
-                            }
-                            self.filtered_data.append(data)
-                    except ValueError as e:
-                        logging.warning(f"Skipping row due to date parsing error: {e}")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
         except FileNotFoundError:
             logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
         except Exception as e:
             logging.error(f"Unexpected error while reading file: {e}")
 
     def calculate_monthly_avg_temp(self):
         """Calculate the average temperature for each month."""
-        monthly_data = defaultdict(list)
-
-        for row in self.filtered_data:
-            try:
-                month = row['date'].month  # Extract month from date
-                year = row['date'].year    # Extract year from date
-                avg_temp = row['avg_temp']
-
-                # Store temperature data indexed by year and month
-                monthly_data[(year, month)].append(avg_temp)  # Example: {(2016, 1): [39]}
-            except Exception as e:
-                logging.warning(f"Skipping row due to data error: {e}")
-
-        # Calculate the average temperature for each month
         monthly_avg_temp = {}  # Contains average temperatures for each month
-        for (year, month), temps in monthly_data.items():
-            monthly_avg_temp[(year, month)] = sum(temps) / len(temps)
+        for (year, month), running_average in self.monthly_data.items():
+            monthly_avg_temp[(year, month)] = running_average.value
 
         return monthly_avg_temp
 
-    def find_highest_avg_temp(self, monthly_avg_temp):
-        """Find the month with the highest average temperature."""
-        highest_avg_temp = float('-inf')
-        highest_month = None
-
-        for (year, month), avg_temp in monthly_avg_temp.items():
-            if avg_temp > highest_avg_temp:
-                highest_avg_temp = avg_temp
-                highest_month = (year, month)
+    def find_highest_avg_temps(self, monthly_avg_temp):
+        """Find the months with the highest average temperature, warmest first."""
+        # nlargest keeps a heap of only self.top months; ties go to the month seen first
+        return heapq.nlargest(self.top, monthly_avg_temp.items(), key=lambda item: item[1])  # [((year, month), avgTemp), ...]
 
-        return highest_month, highest_avg_temp  # ((year, month), highestAvgTemp)
-
-    def export_to_csv(self, month, avg_temp):
-        """Export the month and its average temperature to a CSV file."""
+    def export_to_csv(self, months):
+        """Export the months and their average temperatures to a CSV file."""
         try:
             with open(self.output_file, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['Month', 'AverageTemperature'])  # Header
-                writer.writerow([month[1], avg_temp])  # Month number and average temperature
+                for month, avg_temp in months:
+                    writer.writerow([month[1], avg_temp])  # Month number and average temperature
 
             logging.info(f"Results exported to {self.output_file}")
         except Exception as e:
             logging.error(f"Error exporting results: {e}")
 
-    def analyze(self):
-        """Run the analysis and export the results."""
-        self.read_filtered_data()
+    def report(self):
+        """Find and export the warmest months once all rows have been processed."""
         monthly_avg_temp = self.calculate_monthly_avg_temp()
-        highest_month, highest_avg_temp_value = self.find_highest_avg_temp(monthly_avg_temp)
+        highest_months = self.find_highest_avg_temps(monthly_avg_temp)
 
-        if highest_month:
-            logging.info(f"Month with highest average temperature: Month {highest_month[1]} "
-                         f"of year {highest_month[0]} with an average temperature of {highest_avg_temp_value:.2f}°C")
+        if highest_months:
+            for highest_month, highest_avg_temp_value in highest_months:
+                logging.info(f"Month with highest average temperature: Month {highest_month[1]} "
+                             f"of year {highest_month[0]} with an average temperature of {highest_avg_temp_value:.2f}°C")
 
-            self.export_to_csv(highest_month, highest_avg_temp_value)
+            self.export_to_csv(highest_months)
         else:
             logging.warning("No data available for the specified date range.")
 
+    def analyze(self):
+        """Run the analysis and export the results."""
+        self.read_filtered_data()
+        with metrics.phase('export'):
+            self.report()
+
 if __name__ == "__main__":
     # Parse command-line arguments
-    args_parser = ArgParser()
+    args_parser = ArgParser(allow_incremental=True)
     args = args_parser.parse_args()
 
     # Create an instance of MonthlyTemperatureAnalyzer
-    analyzer = MonthlyTemperatureAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file)
-
-    # Run the analysis
-    analyzer.analyze()
+    analyzer = MonthlyTemperatureAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file, scan_options=args_parser.scan_options(args), engine=args.engine,
+        checkpoint_file=args_parser.checkpoint_file(args), top=args.top)
+
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'max_month_temp', analyzer.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
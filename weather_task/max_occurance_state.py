@@ -1,98 +1,128 @@
 # Task: Find the state with maximum occurrences
 import csv
+import heapq
 import logging
-from datetime import datetime
 from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from checkpoint import run_incremental
+from metrics import metrics
+from result_cache import run_cached
+from numpy_engine import grouped_sums
 from collections import defaultdict
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class StateOccurrenceAnalyzer:
-    def __init__(self, input_file, start_date, end_date, output_file):
+    COLUMNS = ['Station.State']  # CSV columns read from each row
+
+    CHECKPOINT_FIELDS = ['state_counts']  # Aggregate state saved by incremental runs
+
+    def __init__(self, input_file, start_date, end_date, output_file, scan_options=None, engine='python', checkpoint_file=None, top=1):
         self.input_file = input_file
         self.start_date = start_date
         self.end_date = end_date
         self.output_file = output_file
-        self.filtered_data = []  # Store relevant rows
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
+        self.checkpoint_file = checkpoint_file  # Set for --incremental runs, see checkpoint.py
+        self.top = top  # Number of states to report
+        self.state_counts = defaultdict(int)  # Running count per state, default count is zero
+
+    def process_row(self, row, date):
+        """Count the state of a single row in the date range."""
+        # Fill missing state values with 'Unknown'
+        state = row.get('Station.State', 'Unknown')
+        self.state_counts[state] += 1  # Increment count for the state
+
+    def process_batch(self, batch):
+        """Count the states of a batch of rows with np.unique/np.bincount (numpy engine)."""
+        states = batch.strings('Station.State', 'Unknown')
+        for state, _, count in grouped_sums(states):
+            self.state_counts[state] += count
+
+    def merge(self, other):
+        """Add the state counts of another StateOccurrenceAnalyzer to this one."""
+        for state, count in other.state_counts.items():
+            self.state_counts[state] += count
 
     def read_filtered_data(self):
-        """Read the CSV file and store relevant rows within the specified date range."""
+        """Stream the CSV file and count the states within the specified date range."""
+        if self.checkpoint_file:
+            # Only the rows appended since the last run are read
+            try:
+                run_incremental(self, self.checkpoint_file)
+            except FileNotFoundError:
+                logging.error(f"Error: File {self.input_file} not found.")
+            except MissingColumnError:
+                raise  # The input cannot answer this analysis, reported by the caller
+            except Exception as e:
+                logging.error(f"Unexpected error while reading file: {e}")
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)  # Read data in key-value pairs
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                        if self.start_date <= date <= self.end_date:
-                            # Fill missing state values with 'Unknown'
-                            state = row.get('Station.State', 'Unknown')
-                            data = {
-                                'date': date,
-                                'state': state
-                            }
-                            self.filtered_data.append(data)
-                    except ValueError as e:
-                        logging.warning(f"Skipping row due to date parsing error: {e}")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
         except FileNotFoundError:
             logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
         except Exception as e:
             logging.error(f"Unexpected error while reading file: {e}")
 
     def count_state_occurrences(self):
-        """Count occurrences of each state in the filtered data."""
-        state_counts = defaultdict(int)  # Default count is zero
-
-        for row in self.filtered_data:
-            state = row['state']
-            state_counts[state] += 1  # Increment count for the state
+        """Return the occurrences of each state counted while streaming."""
+        return self.state_counts  # e.g. {'NY': 100, 'CA': 782}
 
-        return state_counts  # e.g. {'NY': 100, 'CA': 782}
+    def find_most_common_states(self, state_counts):
+        """Find the states with the maximum occurrences, most common first."""
+        # nlargest keeps a heap of only self.top states; ties go to the state counted first
+        return heapq.nlargest(self.top, state_counts.items(), key=lambda item: item[1])
 
-    def find_most_common_state(self, state_counts):
-        """Find the state with the maximum occurrences."""
-        most_common_state = None
-        max_occurrences = 0
-
-        for state, count in state_counts.items():
-            if count > max_occurrences:
-                max_occurrences = count
-                most_common_state = state
-
-        return most_common_state, max_occurrences
-
-    def export_to_csv(self, state, occurrences):
-        """Export the state and its occurrences to a CSV file."""
+    def export_to_csv(self, states):
+        """Export the states and their occurrences to a CSV file."""
         try:
             with open(self.output_file, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['State', 'Occurrences'])  # Header
-                writer.writerow([state, occurrences])  # State and occurrence count
+                writer.writerows(states)  # State and occurrence count
 
             logging.info(f"Results exported to {self.output_file}")
         except Exception as e:
             logging.error(f"Error exporting results: {e}")
 
-    def analyze(self):
-        """Run the analysis and export the results."""
-        self.read_filtered_data()
+    def report(self):
+        """Find and export the most common states once all rows have been processed."""
         state_counts = self.count_state_occurrences()
-        most_common_state, max_occurrences = self.find_most_common_state(state_counts)
+        most_common_states = self.find_most_common_states(state_counts)
 
-        if most_common_state:
-            logging.info(f"State with maximum occurrences: {most_common_state}")
-            logging.info(f"Number of occurrences: {max_occurrences}")
-            self.export_to_csv(most_common_state, max_occurrences)
+        if most_common_states:
+            for state, occurrences in most_common_states:
+                logging.info(f"State with maximum occurrences: {state}")
+                logging.info(f"Number of occurrences: {occurrences}")
+            self.export_to_csv(most_common_states)
         else:
             logging.warning("No data available for the specified date range.")
 
+    def analyze(self):
+        """Run the analysis and export the results."""
+        self.read_filtered_data()
+        with metrics.phase('export'):
+            self.report()
+
 if __name__ == "__main__":
     # Parse command-line arguments
-    args_parser = ArgParser()
+    args_parser = ArgParser(allow_incremental=True)
     args = args_parser.parse_args()
 
     # Create an instance of StateOccurrenceAnalyzer
-    analyzer = StateOccurrenceAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file)
-
-    # Run the analysis
-    analyzer.analyze()
+    analyzer = StateOccurrenceAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file, scan_options=args_parser.scan_options(args), engine=args.engine,
+        checkpoint_file=args_parser.checkpoint_file(args), top=args.top)
+
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'max_occurance_state', analyzer.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
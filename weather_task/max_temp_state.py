@@ -1,88 +1,146 @@
 import csv
-from datetime import datetime
 from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from metrics import metrics
+from result_cache import run_cached
+from numpy_engine import np, top_indices
+from accumulators import running_extreme
+from records import STATION_COLUMNS, station_of, station_record
+from extreme_index import RangeExtremeIndex
 
 class MaxTemperatureAnalyzer:
-    def __init__(self, input_file, start_date, end_date, output_file):
+    COLUMNS = ['Data.Temperature.Max Temp'] + STATION_COLUMNS  # CSV columns read from each row
+    row_number = None  # Position in the file of the row being processed, set by DailyBuckets
+
+    def __init__(self, input_file, start_date, end_date, output_file, scan_options=None, engine='python', top=1):
         self.input_file = input_file
         self.start_date = start_date
         self.end_date = end_date
         self.output_file = output_file
-        self.filtered_data = []  # Store relevant rows
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # 'python' (row by row) or 'numpy' (vectorized batches)
+        self.top = top  # Number of hottest rows to report
+        self.max_temp = running_extreme('max', top)  # Running maximum (or top k), keeping only the winning stations
+
+    def process_row(self, row, date):
+        """Update the running maximum with a single row within the specified date range."""
+        try:
+            # Convert temperature to float, fill with 0.0 if missing
+            temp = float(row.get('Data.Temperature.Max Temp', 0.0))
+
+            # Update max temperature and corresponding station if found a new max
+            if self.max_temp.is_better(temp):
+                self.max_temp.add(temp, station_of(row), position=self.row_number)
+            else:
+                self.max_temp.count += 1
+        except (TypeError, ValueError) as e:
+            # TypeError: a short row has no temperature at all
+            print(f"Skipping row due to data conversion error: {e}")
+            metrics.count(f"rows_skipped.{type(self).__name__}")
+
+    def process_batch(self, batch):
+        """Update the running maximum with the argmax (or top k) of a batch of rows (numpy engine)."""
+        try:
+            # Empty values become NaN and those rows are skipped, like in process_row
+            max_temps = batch.floats('Data.Temperature.Max Temp', np.nan)
+        except ValueError:
+            # A value is not a number, let the row-by-row path skip just the bad rows
+            for row, date in batch:
+                self.process_row(row, date)
+            return
+
+        valid = ~np.isnan(max_temps)
+        for position in top_indices(max_temps, self.top, valid):
+            self.max_temp.add(max_temps[position].item(), station_of(batch.row(position)), count=0)
+        self.max_temp.count += int(valid.sum())
+
+    def merge(self, other):
+        """Fold the running maximum of another MaxTemperatureAnalyzer into this one."""
+        self.max_temp.merge(other.max_temp)
+
+    def shift_rows(self, offset):
+        """Move the row positions kept for tie-breaking by offset."""
+        self.max_temp.shift(offset)
+
+    def load_from_index(self, index):
+        """Take the maximum of the date range from a range-extreme index instead of the rows."""
+        extreme = index.extreme('max_temp_state', 'max_temp', self.start_date, self.end_date)
+        if extreme is not None:
+            value, _, station = extreme
+            self.max_temp.add(value, station_record(*station), count=0)
 
     def read_filtered_data(self):
-        """Read the CSV file and yield rows within the specified date range."""
+        """Stream the CSV file and track the maximum within the specified date range."""
+        # A range-extreme index (see build_extreme_index.py) answers any range without reading rows;
+        # it only keeps the best row of each day, so --top runs scan
+        index = RangeExtremeIndex.load(self.input_file) if self.top == 1 else None
+        if index:
+            self.load_from_index(index)
+            return
+
         try:
-            with open(self.input_file) as csvfile:
-                reader = csv.DictReader(csvfile)  # Read data in key-value pairs
-                for row in reader:
-                    try:
-                        date = datetime.strptime(row['Date.Full'], '%Y-%m-%d')
-                        if self.start_date <= date <= self.end_date:
-                            self.filtered_data.append(row)  # Collect relevant rows
-                    except ValueError as e:
-                        print(f"Skipping row due to date parsing error: {e}")
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
         except FileNotFoundError:
             print(f"Error: File {self.input_file} not found.")
             return
 
     def find_max_temperature(self):
-        """Find the maximum temperature and its corresponding location and state."""
-        max_temp = float('-inf')
-        max_temp_row = None
-
-        for row in self.filtered_data:
-            try:
-                # Convert temperature to float, fill with 0.0 if missing
-                temp = float(row.get('Data.Temperature.Max Temp', 0.0))
-                
-                # Update max temperature and corresponding row if found a new max
-                if temp > max_temp:
-                    max_temp = temp
-                    max_temp_row = row
-            except ValueError as e:
-                print(f"Skipping row due to data conversion error: {e}")
-
-        return max_temp, max_temp_row
-
-    def export_to_csv(self, max_temp, location, state):
-        """Export the maximum temperature, location, and state to a CSV file."""
+        """Find the maximum temperatures and their stations, hottest first."""
+        return self.max_temp.items()  # [(max_temp, station), ...]
+
+    def export_to_csv(self, rows):
+        """Export the maximum temperatures, locations, and states to a CSV file."""
         try:
             with open(self.output_file, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['MaxTemperature', 'Location', 'State'])  # Header
-                writer.writerow([max_temp, location, state])  # Data row
+                writer.writerows(rows)  # Data rows
 
             print(f"Results exported to {self.output_file}")
         except Exception as e:
             print(f"Error exporting results: {e}")
 
-    def analyze(self):
-        """Run the analysis and export the results."""
-        self.read_filtered_data()  # Read and filter data
-        max_temp, max_temp_row = self.find_max_temperature()
+    def report(self):
+        """Find and export the maximum temperature once all rows have been processed."""
+        maxima = self.find_max_temperature()
 
-        if max_temp_row is not None:
-            location = max_temp_row['Station.Location']
-            state = max_temp_row['Station.State']
+        if maxima:
+            rows = []
+            for max_temp, station in maxima:
+                location = station.location
+                state = station.state
 
-            # Print the results on the console
-            print(f"Maximum Temperature: {max_temp}°C")
-            print(f"Location: {location}")
-            print(f"State: {state}")
+                # Print the results on the console
+                print(f"Maximum Temperature: {max_temp}°C")
+                print(f"Location: {location}")
+                print(f"State: {state}")
+                rows.append([max_temp, location, state])
 
             # Export the results
-            self.export_to_csv(max_temp, location, state)
+            self.export_to_csv(rows)
         else:
             print("No data available for the specified date range.")
 
+    def analyze(self):
+        """Run the analysis and export the results."""
+        self.read_filtered_data()  # Read and filter data
+        with metrics.phase('export'):
+            self.report()
+
 if __name__ == "__main__":
     # Parse command-line arguments
     args_parser = ArgParser()
     args = args_parser.parse_args()
 
     # Create an instance of MaxTemperatureAnalyzer
-    analyzer = MaxTemperatureAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file)
+    analyzer = MaxTemperatureAnalyzer(args.input_file, args.start_date, args.end_date, args.output_file, scan_options=args_parser.scan_options(args), engine=args.engine,
+        top=args.top)
 
-    # Run the analysis
-    analyzer.analyze()
+    # Run the analysis, or reuse the result of an identical earlier run
+    try:
+        run_cached(args, 'max_temp_state', analyzer.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
@@ -0,0 +1,150 @@
+import json
+import logging
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Phases of a run, in the order they are reported
+PHASES = ['open', 'parse', 'date_filter', 'convert', 'aggregate', 'export']
+
+
+class Metrics:
+    """Per-phase timings and row counters of one run, written as JSON by --metrics-file.
+
+    Phase times are exclusive: time spent in a phase nested inside another one (e.g. parse
+    inside date_filter) is only counted once, for the inner phase. CPU time is measured
+    for block phases only and includes their nested phases. Collection is off until
+    enable() is called, so the row loops pay nothing in normal runs.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.reset()
+
+    def reset(self, enabled=False):
+        """Drop everything collected so far, e.g. in a worker process forked mid-run."""
+        self.enabled = enabled
+        self.started = (time.perf_counter(), time.process_time())
+        self.wall_times = defaultdict(float)
+        self.cpu_times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.nested = []  # Time spent in nested phases, one entry per phase being measured
+
+    def enable(self, trace_memory=False):
+        """Start collecting; with trace_memory also track the Python heap peak (slow)."""
+        self.reset(enabled=True)
+        self.trace_memory = trace_memory
+        if trace_memory:
+            tracemalloc.start()
+
+    def count(self, name, value=1):
+        """Add value to a counter, e.g. rows skipped by an analyzer."""
+        self.counters[name] += value
+
+    def record(self, phase, started, cpu_started=None):
+        """Close a measurement opened at started and charge its exclusive time to phase."""
+        elapsed = time.perf_counter() - started
+        nested = self.nested.pop()
+        self.wall_times[phase] += elapsed - nested
+        if cpu_started is not None:
+            self.cpu_times[phase] += time.process_time() - cpu_started
+        self.calls[phase] += 1
+        if self.nested:
+            self.nested[-1] += elapsed
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the wall and CPU time of a block, e.g. opening the input or exporting results."""
+        if not self.enabled:
+            yield
+            return
+
+        self.nested.append(0.0)
+        started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.record(name, started, cpu_started)
+
+    def timed(self, name, iterable, counter=None):
+        """Wrap an iterable so the time spent producing each item is charged to a phase.
+
+        Only wall time is measured here, reading the CPU clock for every row would cost
+        more than most phases take. With counter, the items are also counted.
+        """
+        if not self.enabled:
+            return iterable
+        return self.timed_items(name, iterable, counter)
+
+    def timed_items(self, name, iterable, counter):
+        """Generator behind timed()."""
+        iterator = iter(iterable)
+        while True:
+            self.nested.append(0.0)
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.record(name, started)
+                return
+            self.record(name, started)
+            if counter:
+                self.counters[counter] += 1
+            yield item
+
+    def snapshot(self):
+        """Return the collected timings and counters as plain dicts, e.g. to send back from a worker."""
+        return {
+            'wall_times': dict(self.wall_times),
+            'cpu_times': dict(self.cpu_times),
+            'calls': dict(self.calls),
+            'counters': dict(self.counters)
+        }
+
+    def merge(self, snapshot):
+        """Add the snapshot of a worker process to this run."""
+        for name in ('wall_times', 'cpu_times', 'calls', 'counters'):
+            totals = getattr(self, name)
+            for key, value in snapshot[name].items():
+                totals[key] += value
+
+    def report(self):
+        """Build the JSON-ready metrics of the run so far."""
+        phases = {}
+        for phase in PHASES + sorted(set(self.calls) - set(PHASES)):
+            if phase in self.calls:
+                phases[phase] = {'wall_time': round(self.wall_times[phase], 6), 'calls': self.calls[phase]}
+                if phase in self.cpu_times:
+                    phases[phase]['cpu_time'] = round(self.cpu_times[phase], 6)
+
+        report = {
+            'command': sys.argv,
+            'wall_time': round(time.perf_counter() - self.started[0], 6),
+            'cpu_time': round(time.process_time() - self.started[1], 6),
+            'phases': phases,
+            'counters': dict(sorted(self.counters.items())),
+            # Kilobytes on Linux; worker processes are reported separately
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'peak_rss_children_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        }
+        if self.trace_memory and tracemalloc.is_tracing():
+            report['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        return report
+
+    def save(self, metrics_file):
+        """Write the report to a JSON file."""
+        try:
+            with open(metrics_file, 'w') as f:
+                json.dump(self.report(), f, indent=2)
+            logging.info(f"Metrics written to {metrics_file}")
+        except OSError as e:
+            logging.error(f"Error writing metrics: {e}")
+
+
+# Shared by the stream and the analyzers of one process, like the logging module
+metrics = Metrics()
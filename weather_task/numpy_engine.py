@@ -0,0 +1,142 @@
+try:
+    import numpy as np
+except ImportError:  # The numpy engine is optional, the python engine needs nothing extra
+    np = None
+
+from metrics import metrics
+
+ENGINES = ('python', 'numpy')
+BATCH_SIZE = 65536  # Rows collected before a batch is handed to the numpy analyzers
+
+
+class RowBatch:
+    """A batch of matching rows held as field tuples, with columns converted to NumPy arrays on demand.
+
+    Columns are built straight from the tuples, without a dict per row, and cached, so
+    analyzers sharing a stream convert each column only once.
+    """
+
+    def __init__(self, fields, records, dates):
+        self.fields = fields  # Column names of the tuples in records
+        self.records = records  # One field tuple per row
+        self.dates = dates
+        self.arrays = {}
+        self.transposed = None  # One tuple per column, built on first use
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        """Yield (row, date) pairs with dict rows, for analyzers falling back to process_row."""
+        for position, date in enumerate(self.dates):
+            yield self.row(position), date
+
+    def row(self, position):
+        """Return one row as a dict, like the rows process_row gets."""
+        return dict(zip(self.fields, self.records[position]))
+
+    def values(self, column):
+        """Return the raw text of a column as a tuple, None where a short row lacks it."""
+        if self.transposed is None:
+            self.transposed = list(zip(*self.records))  # Transposed in C, one pass for every column
+        return self.transposed[self.fields.index(column)]
+
+    def strings(self, column, default):
+        """Return the column as an array of strings, default filling missing values."""
+        key = ('str', column, default)
+        if key not in self.arrays:
+            if column not in self.fields:
+                values = np.full(len(self.records), default)
+            else:
+                values = self.values(column)
+                if None in values:
+                    values = [default if value is None else value for value in values]  # Short rows
+                values = np.array(values)
+            self.arrays[key] = values
+        return self.arrays[key]
+
+    def parsed(self, column):
+        """Return (floats, empty) for a column: NaN where a value is empty or missing, and the mask of those.
+
+        Parsed once per column, whatever default the analyzers ask for.
+        Raises ValueError if a value is not a number.
+        """
+        key = ('parsed', column)
+        if key not in self.arrays:
+            values = self.values(column)
+            try:
+                if None in values:
+                    raise ValueError  # numpy would turn None into NaN without marking it empty
+                self.arrays[key] = np.array(values, dtype=np.float64), None  # numpy parses the text in C
+            except ValueError:
+                empty = np.array([value is None or value == '' for value in values])
+                values = [np.nan if value is None or value == '' else value for value in values]
+                self.arrays[key] = np.array(values, dtype=np.float64), empty
+        return self.arrays[key]
+
+    def floats(self, column, default):
+        """Return the column as a float array, default filling missing or empty values.
+
+        Use default=nan for analyzers that skip rows with empty values.
+        Raises ValueError if a value is not a number.
+        """
+        key = ('float', column, default)
+        if key not in self.arrays:
+            with metrics.phase('convert'):
+                if column not in self.fields:
+                    self.arrays[key] = np.full(len(self.records), default, dtype=np.float64)
+                    return self.arrays[key]
+                values, empty = self.parsed(column)
+                if empty is not None and not np.isnan(default):
+                    values = np.where(empty, default, values)
+                self.arrays[key] = values
+        return self.arrays[key]
+
+    def months(self):
+        """Return (year, month) keys as year * 12 + month - 1 for every row."""
+        if 'months' not in self.arrays:
+            try:
+                days = self.strings('Date.Full', '').astype('datetime64[M]')
+            except ValueError:
+                # Unusual spellings such as 2016-1-3, fall back to the parsed dates
+                days = np.array(self.dates, dtype='datetime64[M]')
+            self.arrays['months'] = days.astype(np.int64) + 1970 * 12
+        return self.arrays['months']
+
+    def years(self):
+        """Return the year of every row."""
+        return self.months() // 12
+
+
+def grouped_sums(keys, values=None):
+    """Sum values per key with np.bincount; without values only the rows are counted.
+
+    Returns (key, sum, count) tuples in order of first appearance, like a dict filled row by row.
+    """
+    unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique_keys))
+    counts = np.bincount(inverse, minlength=len(unique_keys))
+    order = np.argsort(first_index, kind='stable')
+    return [(unique_keys[i].item(), sums[i].item(), counts[i].item()) for i in order]
+
+
+def top_indices(values, k, mask=None, largest=True):
+    """Return the positions of the k largest (or smallest) values where mask is set, best first.
+
+    Uses a partial sort (np.partition), so a batch costs O(n) instead of a full sort;
+    ties go to the earlier position.
+    """
+    positions = np.flatnonzero(mask) if mask is not None else np.arange(len(values))
+    if len(positions) == 0:
+        return []
+    if k == 1:
+        selected = values[positions]
+        return [positions[selected.argmax() if largest else selected.argmin()].item()]
+    keys = -values[positions] if largest else values[positions]  # Smaller key is better
+    candidates = np.arange(len(keys))
+    if k < len(keys):
+        # Everything at or better than the k-th best key, including all ties with it
+        threshold = np.partition(keys, k - 1)[k - 1]
+        candidates = np.flatnonzero(keys <= threshold)
+    best = candidates[np.lexsort((candidates, keys[candidates]))][:k]
+    return positions[best].tolist()
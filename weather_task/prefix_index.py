@@ -0,0 +1,144 @@
+import bisect
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from compressed_input import open_input
+from date_filter import parse_date
+from date_index import file_identity
+
+PREFIX_SUFFIX = '.prefix.json'
+
+# Index column -> CSV column
+COLUMNS = {
+    'max_temp': 'Data.Temperature.Max Temp',
+    'min_temp': 'Data.Temperature.Min Temp',
+    'avg_temp': 'Data.Temperature.Avg Temp',
+    'wind_dir': 'Data.Wind.Direction',
+    'wind_speed': 'Data.Wind.Speed'
+}
+# Columns WeatherDataProcessor averages together: a row with one bad value is skipped for all of them
+AVERAGE_COLUMNS = ['max_temp', 'min_temp', 'wind_dir', 'wind_speed']
+
+
+class PrefixSumIndex:
+    """Per-day cumulative sums and counts of the numeric columns, persisted next to the input.
+
+    sums[column][i] holds the total of every row dated before days[i], so the sum over any
+    date range is two binary searches and a subtraction. Values are read the way the
+    analyzers read them: empty values count as 0.0 and unreadable ones are skipped.
+    """
+
+    def __init__(self, input_file, size, mtime, days, sums, counts):
+        self.input_file = input_file
+        self.size = size
+        self.mtime = mtime
+        self.days = days  # Sorted day numbers (date.toordinal()) that have rows
+        self.sums = sums  # Column -> len(days) + 1 running totals, starting at 0
+        self.counts = counts  # Column -> len(days) + 1 running row counts, starting at 0
+
+    @staticmethod
+    def index_path(input_file):
+        """Return the sidecar file name for an input file, e.g. weather.csv.prefix.json."""
+        return input_file + PREFIX_SUFFIX
+
+    @classmethod
+    def build(cls, input_file):
+        """Scan the CSV once, in any row order, and accumulate the columns per day."""
+        size, mtime = file_identity(input_file)
+        daily = {}  # Day number -> ({column: sum}, {column: count})
+
+        with open_input(input_file) as csvfile:
+            for row in csv.DictReader(csvfile):
+                try:
+                    day = parse_date(row['Date.Full']).toordinal()
+                except ValueError as e:
+                    logging.warning(f"Skipping row due to date parsing error: {e}")
+                    continue
+
+                values = {}
+                for column, csv_column in COLUMNS.items():
+                    try:
+                        values[column] = float(row.get(csv_column) or 0.0)
+                    except ValueError:
+                        values[column] = None  # Unreadable, not counted
+
+                if any(values[column] is None for column in AVERAGE_COLUMNS):
+                    for column in AVERAGE_COLUMNS:
+                        values[column] = None
+
+                sums, counts = daily.setdefault(day, ({column: 0.0 for column in COLUMNS}, {column: 0 for column in COLUMNS}))
+                for column, value in values.items():
+                    if value is not None:
+                        sums[column] += value
+                        counts[column] += 1
+
+        days = sorted(daily)
+        sums = {column: [0.0] for column in COLUMNS}
+        counts = {column: [0] for column in COLUMNS}
+        for day in days:
+            day_sums, day_counts = daily[day]
+            for column in COLUMNS:
+                sums[column].append(sums[column][-1] + day_sums[column])
+                counts[column].append(counts[column][-1] + day_counts[column])
+
+        return cls(input_file, size, mtime, days, sums, counts)
+
+    def save(self):
+        """Write the index next to the input file."""
+        with open(self.index_path(self.input_file), 'w') as f:
+            json.dump({
+                'size': self.size,
+                'mtime': self.mtime,
+                'days': self.days,
+                'sums': self.sums,
+                'counts': self.counts
+            }, f)
+
+    @classmethod
+    def load(cls, input_file):
+        """Load the prefix-sum index, or return None if it is missing or out of date."""
+        path = cls.index_path(input_file)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable prefix index {path}: {e}")
+            return None
+
+        if (data['size'], data['mtime']) != file_identity(input_file):
+            logging.warning(f"Ignoring stale prefix index {path}: {input_file} changed since it was built.")
+            return None
+
+        return cls(input_file, data['size'], data['mtime'], data['days'], data['sums'], data['counts'])
+
+    def positions(self, start_date, end_date):
+        """Return the [first, last) positions of the days within [start_date, end_date]."""
+        first = bisect.bisect_left(self.days, start_date.toordinal())
+        last = bisect.bisect_right(self.days, end_date.toordinal())
+        return first, max(first, last)
+
+    def range_total(self, column, start_date, end_date):
+        """Return the (sum, count) of a column over the rows dated within [start_date, end_date]."""
+        first, last = self.positions(start_date, end_date)
+        return self.sums[column][last] - self.sums[column][first], self.counts[column][last] - self.counts[column][first]
+
+    def yearly_totals(self, column, start_date, end_date):
+        """Yield (year, sum, count) for each year holding rows in the range."""
+        if not self.days:
+            return
+
+        # Years before the first or after the last day of the file hold nothing
+        year_start = max(start_date, datetime.fromordinal(self.days[0]))
+        end_date = min(end_date, datetime.fromordinal(self.days[-1]))
+        while year_start <= end_date:
+            next_start = datetime(year_start.year + 1, 1, 1)
+            year_end = min(end_date, datetime.fromordinal(next_start.toordinal() - 1))
+            total, count = self.range_total(column, year_start, year_end)
+            if count:
+                yield year_start.year, total, count
+            year_start = next_start
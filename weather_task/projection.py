@@ -0,0 +1,46 @@
+import csv
+from operator import itemgetter
+
+
+class MissingColumnError(ValueError):
+    """A column an analysis reads is not in the input's header; reported to the user rather than logged."""
+
+
+def resolve_columns(fieldnames, columns, source='input'):
+    """Return the position of every column in the header, raising MissingColumnError if one is missing."""
+    missing = [column for column in columns if column not in fieldnames]
+    if missing:
+        raise MissingColumnError(
+            f"{source} has no column {', '.join(repr(column) for column in missing)}; "
+            f"its header is: {', '.join(fieldnames)}"
+        )
+    return [fieldnames.index(column) for column in columns]
+
+
+def projected_fields(lines, fieldnames, columns=None, source='input'):
+    """Parse CSV lines with csv.reader into tuples holding only the given columns, in that order.
+
+    Column positions are resolved from the header once, up front, so a missing column
+    fails before any row is read, and a row costs a tuple lookup instead of a dict of
+    every column as with csv.DictReader. columns=None keeps all of them.
+    """
+    columns = list(fieldnames) if columns is None else list(columns)
+    positions = resolve_columns(fieldnames, columns, source)
+    return iter_projected(lines, positions)
+
+
+def iter_projected(lines, positions):
+    """Generator behind projected_fields()."""
+    width = max(positions, default=-1) + 1
+    if len(positions) == 1:
+        position = positions[0]
+        pick = lambda fields: (fields[position],)  # itemgetter returns a bare value for one position
+    else:
+        pick = itemgetter(*positions)
+
+    for fields in csv.reader(lines):
+        if not fields:
+            continue  # Blank line, skipped like csv.DictReader does
+        if len(fields) < width:
+            fields += [None] * (width - len(fields))  # Short row, missing values are None like csv.DictReader
+        yield pick(fields)
@@ -0,0 +1,439 @@
+# Task: Answer group-by/aggregate questions about the weather data with one pass over the CSV
+import csv
+import heapq
+import json
+import logging
+import os
+import re
+from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from metrics import metrics
+from result_cache import run_cached
+from accumulators import RunningAverage, RunningExtreme
+from sketches import HyperLogLog, KLLSketch, ReservoirSample
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+# Approximate aggregates kept in bounded-memory sketches; pNN is any percentile, e.g. p95
+SKETCH_AGGREGATES = ('median', 'pNN', 'distinct')
+PERCENTILE = re.compile(r'p(\d{1,2}(?:\.\d+)?)$')
+ORDERS = ('asc', 'desc')
+
+
+def year_of(date):
+    """Group key of the year a row belongs to."""
+    return date.year
+
+
+def month_of(date):
+    """Group key of the month a row belongs to, e.g. 2016-03."""
+    return f"{date.year}-{date.month:02d}"
+
+
+# Group keys computed from the row's parsed date instead of read from a column
+DATE_KEYS = {
+    'year': year_of,
+    'month': month_of
+}
+
+# The analyses of the weather_task scripts expressed as queries, see --query.
+# Empty values are left out here, where some scripts count them as 0.0.
+BUILTIN_QUERIES = {
+    'avg_cal': {
+        'aggregates': [
+            'mean:Data.Temperature.Max Temp', 'mean:Data.Temperature.Min Temp',
+            'mean:Data.Wind.Direction', 'mean:Data.Wind.Speed'
+        ]
+    },
+    'highest_temp_day': {
+        'group_by': ['Date.Full', 'Station.City', 'Station.State'],
+        'aggregates': ['max:Data.Temperature.Max Temp'], 'order': 'desc', 'limit': 1
+    },
+    'lowest_avg_temp_year': {
+        'group_by': ['year'], 'aggregates': ['mean:Data.Temperature.Avg Temp'], 'order': 'asc', 'limit': 1
+    },
+    # One row per state instead of one station per category
+    'max_min_state_temp': {
+        'group_by': ['Station.State'],
+        'aggregates': [
+            'max:Data.Temperature.Max Temp', 'max:Data.Wind.Speed',
+            'min:Data.Temperature.Min Temp', 'min:Data.Wind.Speed'
+        ]
+    },
+    'max_month_temp': {
+        'group_by': ['month'], 'aggregates': ['mean:Data.Temperature.Avg Temp'], 'order': 'desc', 'limit': 1
+    },
+    'max_occurance_state': {
+        'group_by': ['Station.State'], 'aggregates': ['count'], 'order': 'desc', 'limit': 1
+    },
+    'max_temp_state': {
+        'group_by': ['Station.Location', 'Station.State'],
+        'aggregates': ['max:Data.Temperature.Max Temp'], 'order': 'desc', 'limit': 1
+    }
+}
+
+
+class Aggregate:
+    """One 'function:column' aggregate of a query, e.g. mean:Data.Temperature.Avg Temp.
+
+    A bare 'count' counts rows; with a column it counts the rows where the column is not empty.
+    median, pNN and distinct are approximate: they keep a KLL or HyperLogLog sketch per group
+    instead of every value, and report its error bound next to the result.
+    """
+
+    def __init__(self, spec, sketch_k=200, hll_precision=12):
+        function, _, column = spec.partition(':')
+        percentile = PERCENTILE.match(function)
+        if function not in AGGREGATES + ('median', 'distinct') and not percentile:
+            raise ValueError(
+                f"Unknown aggregate '{function}', expected one of {', '.join(AGGREGATES + SKETCH_AGGREGATES)}"
+            )
+        if function != 'count' and not column:
+            raise ValueError(f"Aggregate '{function}' needs a column, e.g. {function}:Data.Temperature.Max Temp")
+        self.function = function
+        self.column = column or None
+        self.name = f"{function}({column})" if column else function  # Output column header
+
+        # Rank of the quantile for median and pNN, None for the other aggregates
+        self.quantile = 0.5 if function == 'median' else float(percentile.group(1)) / 100 if percentile else None
+        self.sketch_k = sketch_k  # KLL accuracy parameter, memory per group grows linearly with it
+        self.hll_precision = hll_precision  # HyperLogLog keeps 2**precision one-byte registers per group
+
+    @property
+    def approximate(self):
+        """Check whether the aggregate is answered from a sketch."""
+        return self.quantile is not None or self.function == 'distinct'
+
+    def create(self):
+        """Create the empty running state of this aggregate for a new group."""
+        if self.function in ('min', 'max'):
+            return RunningExtreme(self.function)
+        if self.quantile is not None:
+            return KLLSketch(self.sketch_k)
+        if self.function == 'distinct':
+            return HyperLogLog(self.hll_precision)
+        return RunningAverage()  # Running sum and count cover count, sum and mean
+
+    def update(self, state, row):
+        """Add a row to the running state; return False if its value is not a number."""
+        if self.column is None:
+            state.add(0.0)  # Only the count is used
+            return True
+
+        value = row.get(self.column)
+        if not value:
+            return True  # Missing or empty values are left out, like NULL in SQL
+        if self.function == 'count':
+            state.add(0.0)
+            return True
+        if self.function == 'distinct':
+            state.add(value)  # Counted as text, e.g. Station.Code
+            return True
+
+        try:
+            value = float(value)
+        except ValueError:
+            return False
+        if self.function in ('min', 'max'):
+            state.add(value, value)
+        else:
+            state.add(value)  # Running average or KLL sketch
+        return True
+
+    def result(self, state):
+        """Return the final value of the aggregate, None if the group had no values."""
+        if self.function == 'count':
+            return state.count
+        if self.function == 'sum':
+            return state.total
+        if self.function == 'mean':
+            return state.value
+        if self.quantile is not None:
+            return state.quantile(self.quantile)
+        if self.function == 'distinct':
+            return round(state.estimate())
+        return state.value if state.item is not None else None
+
+    def error(self, state):
+        """Return the error bound of an approximate result: normalized rank error or relative standard error."""
+        if self.quantile is not None:
+            return round(state.rank_error(), 4)
+        return round(state.relative_error(), 4)
+
+
+class GroupByQuery:
+    """A group-by/aggregate query answered with one hash-aggregate pass over the filtered rows.
+
+    Rows are grouped by the values of group_by (CSV columns, or the year/month of the row's
+    date) and every aggregate of the group is updated in place, so memory grows with the
+    number of groups rather than rows. Without group_by the whole range is one group.
+    With sample, a uniform reservoir sample of the filtered rows is kept alongside.
+    """
+
+    engine = 'python'  # Rows are aggregated one by one
+
+    def __init__(self, input_file, start_date, end_date, output_file, group_by=(), aggregates=('count',),
+                 order=None, order_by=None, limit=None, scan_options=None, sketch_k=200, hll_precision=12, sample=None):
+        if order is not None and order not in ORDERS:
+            raise ValueError(f"Unknown order '{order}', expected one of {', '.join(ORDERS)}")
+        if limit is not None and limit < 1:
+            raise ValueError("Limit must be at least 1.")
+        if not aggregates:
+            raise ValueError("A query needs at least one aggregate.")
+        if sketch_k < 8:
+            raise ValueError("Sketch k must be at least 8.")
+        if not 4 <= hll_precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16.")
+        if sample is not None and sample < 1:
+            raise ValueError("Sample size must be at least 1.")
+
+        self.input_file = input_file
+        self.start_date = start_date
+        self.end_date = end_date
+        self.output_file = output_file
+        self.group_by = list(group_by)
+        self.aggregates = [Aggregate(spec, sketch_k, hll_precision) for spec in aggregates]
+        self.order = order  # 'asc', 'desc', or None to keep groups in the order they were first seen
+        self.limit = limit  # Number of groups to report, None for all
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+
+        # Aggregate the groups are ordered by, the first one by default
+        names = [aggregate.name for aggregate in self.aggregates]
+        specs = list(aggregates)
+        order_by = order_by or specs[0]
+        if order_by not in names and order_by not in specs:
+            raise ValueError(f"Cannot order by '{order_by}', it is not one of the aggregates")
+        self.order_index = names.index(order_by) if order_by in names else specs.index(order_by)
+
+        # Compiled once: (column, date key function or None) per group key
+        self.keys = [(column, DATE_KEYS.get(column)) for column in self.group_by]
+        self.groups = {}  # Group key tuple -> running state of every aggregate
+        self.sample = ReservoirSample(sample) if sample else None  # Sampled rows, written next to the output
+
+    def spec(self):
+        """Return the query as a plain dict, e.g. to key its results in the result cache."""
+        return {
+            'group_by': self.group_by,
+            'aggregates': [aggregate.name for aggregate in self.aggregates],
+            'order': self.order,
+            'order_by': self.aggregates[self.order_index].name,
+            'limit': self.limit,
+            'sketch_k': self.aggregates[0].sketch_k,
+            'hll_precision': self.aggregates[0].hll_precision,
+            'sample': self.sample.size if self.sample else None
+        }
+
+    @property
+    def COLUMNS(self):
+        """CSV columns read from each row, None while sampling since sampled rows are kept whole."""
+        if self.sample:
+            return None
+        columns = [column for column, function in self.keys if not function]
+        columns += [aggregate.column for aggregate in self.aggregates if aggregate.column]
+        return list(dict.fromkeys(columns))
+
+    def process_row(self, row, date):
+        """Add a single row in the date range to its group."""
+        key = tuple(function(date) if function else row.get(column, 'N/A') for column, function in self.keys)
+        states = self.groups.get(key)
+        if states is None:
+            states = self.groups[key] = [aggregate.create() for aggregate in self.aggregates]
+
+        for aggregate, state in zip(self.aggregates, states):
+            if not aggregate.update(state, row):
+                logging.warning(f"Skipping value of {aggregate.name} due to data conversion error: {row.get(aggregate.column)!r}")
+                metrics.count(f"rows_skipped.{type(self).__name__}")
+
+        if self.sample:
+            self.sample.add(row)
+
+    def merge(self, other):
+        """Fold the groups of another GroupByQuery (e.g. from a worker process) into this one."""
+        for key, states in other.groups.items():
+            if key not in self.groups:
+                self.groups[key] = states
+                continue
+            for state, other_state in zip(self.groups[key], states):
+                state.merge(other_state)
+        if self.sample:
+            self.sample.merge(other.sample)
+
+    def read_filtered_data(self):
+        """Stream the CSV file and aggregate the rows within the specified date range."""
+        try:
+            stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+            stream.register(self)
+            stream.run()
+
+            logging.info(f"Aggregated the filtered rows into {len(self.groups)} groups.")
+
+        except FileNotFoundError:
+            logging.error(f"Error: File {self.input_file} not found.")
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
+        except Exception as e:
+            logging.error(f"Unexpected error while reading file: {e}")
+
+    def results(self):
+        """Return one [key..., aggregate..., error...] row per group, ordered and limited as requested.
+
+        The error columns hold the error bounds of the approximate aggregates, see Aggregate.error.
+        """
+        rows = [
+            list(key)
+            + [aggregate.result(state) for aggregate, state in zip(self.aggregates, states)]
+            + [aggregate.error(state) for aggregate, state in zip(self.aggregates, states) if aggregate.approximate]
+            for key, states in self.groups.items()
+        ]
+        if self.order:
+            position = len(self.group_by) + self.order_index
+            ranked = [row for row in rows if row[position] is not None]
+            unranked = [row for row in rows if row[position] is None]  # Groups without values go last
+
+            # Ties keep the order the groups were first seen in; with a limit only a heap of that size is kept
+            descending = self.order == 'desc'
+            if self.limit:
+                pick = heapq.nlargest if descending else heapq.nsmallest
+                ranked = pick(self.limit, ranked, key=lambda row: row[position])
+            else:
+                ranked = sorted(ranked, key=lambda row: row[position], reverse=descending)
+            rows = ranked + unranked
+
+        return rows[:self.limit] if self.limit else rows
+
+    def export_to_csv(self, rows):
+        """Export the result rows to a CSV file."""
+        try:
+            with open(self.output_file, 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(
+                    self.group_by
+                    + [aggregate.name for aggregate in self.aggregates]
+                    + [f"error({aggregate.name})" for aggregate in self.aggregates if aggregate.approximate]
+                )  # Header
+                writer.writerows(rows)  # One row per group
+
+            logging.info(f"Results exported to {self.output_file}")
+        except Exception as e:
+            logging.error(f"Error exporting results: {e}")
+
+    def sample_path(self):
+        """Build the file of the row sample, e.g. output.csv -> output_sample.csv."""
+        base, ext = os.path.splitext(self.output_file)
+        return f"{base}_sample{ext or '.csv'}"
+
+    def export_sample(self):
+        """Export the sampled rows, with all their columns, to a CSV file."""
+        try:
+            with open(self.sample_path(), 'w', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=list(self.sample.items[0]))
+                writer.writeheader()
+                writer.writerows(self.sample.items)
+
+            logging.info(f"Sample of {len(self.sample.items)} of {self.sample.count} rows exported to {self.sample_path()}")
+        except Exception as e:
+            logging.error(f"Error exporting sample: {e}")
+
+    def report(self):
+        """Compute and export the query result once all rows have been processed."""
+        rows = self.results()
+        if rows:
+            logging.info(f"Query returned {len(rows)} rows.")
+            for aggregate in self.aggregates:
+                if aggregate.quantile is not None:
+                    logging.info(f"{aggregate.name} is approximate: the rank error columns bound how far "
+                                 f"the reported value's rank can be off, as a fraction of the group's rows (99% confidence).")
+                elif aggregate.approximate:
+                    logging.info(f"{aggregate.name} is approximate: the error column is the relative standard error of the count.")
+            self.export_to_csv(rows)
+        else:
+            logging.warning("No data available for the specified date range.")
+
+        if self.sample and self.sample.items:
+            self.export_sample()
+
+    def analyze(self):
+        """Run the query and export the results."""
+        self.read_filtered_data()
+        with metrics.phase('export'):
+            self.report()
+
+
+def add_query_arguments(parser):
+    """Add the query options (--query, --group-by, --agg, ...) to an argument parser."""
+    parser.add_argument(
+        '--query', choices=sorted(BUILTIN_QUERIES),
+        help="Start from the query behind one of the weather_task analyses; the flags below override it"
+    )
+    parser.add_argument(
+        '--group-by', action='append', metavar='COLUMN',
+        help=f"Group by a CSV column or by {' / '.join(DATE_KEYS)} of the row's date (repeatable)"
+    )
+    parser.add_argument(
+        '--agg', action='append', metavar='FUNCTION[:COLUMN]',
+        help=f"Aggregate to compute per group, one of {', '.join(AGGREGATES + SKETCH_AGGREGATES)}, "
+             "e.g. 'mean:Data.Temperature.Avg Temp' (repeatable); median, pNN and distinct are approximate"
+    )
+    parser.add_argument(
+        '--order', choices=ORDERS, help="Order the groups by an aggregate, ascending or descending"
+    )
+    parser.add_argument(
+        '--order-by', type=str, help="Aggregate to order by, e.g. 'count'; defaults to the first --agg"
+    )
+    parser.add_argument(
+        '--limit', type=int, help="Report only this many groups"
+    )
+
+    # Adding arguments for the approximate aggregates
+    parser.add_argument(
+        '--sketch-k', type=int, default=200,
+        help="Accuracy of the median/pNN sketches: rank error ~2.3/k, memory ~3k values per group"
+    )
+    parser.add_argument(
+        '--hll-precision', type=int, default=12,
+        help="Accuracy of the distinct sketches: 2**precision bytes per group, error 1.04/sqrt(2**precision)"
+    )
+    parser.add_argument(
+        '--sample', type=int, help="Also write a uniform random sample of this many filtered rows to <output>_sample.csv"
+    )
+
+
+def query_options(args):
+    """Combine --query with the explicit query flags into GroupByQuery keyword arguments."""
+    options = dict(BUILTIN_QUERIES.get(args.query, {}))
+    if args.group_by:
+        options['group_by'] = args.group_by
+    if args.agg:
+        options['aggregates'] = args.agg
+    for name in ('order', 'order_by', 'limit', 'sketch_k', 'hll_precision', 'sample'):
+        if getattr(args, name) is not None:
+            options[name] = getattr(args, name)
+    return options
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    arg_parser = ArgParser(allow_top=False, allow_engine=False)  # --limit caps the groups, rows are aggregated one by one
+    add_query_arguments(arg_parser.parser)
+    args = arg_parser.parse_args()
+
+    # Create an instance of GroupByQuery
+    try:
+        query = GroupByQuery(
+            args.input_file, args.start_date, args.end_date, args.output_file, scan_options=arg_parser.scan_options(args),
+            **query_options(args)
+        )
+    except ValueError as e:
+        arg_parser.parser.error(str(e))
+
+    # Run the query, or reuse the result of an identical earlier run
+    try:
+        if query.sample:
+            query.analyze()  # The cache keeps only the main output, not the sample file next to it
+        else:
+            run_cached(args, f"query_engine:{json.dumps(query.spec(), sort_keys=True)}", query.analyze)
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
@@ -0,0 +1,63 @@
+import sys
+from functools import lru_cache
+
+# CSV columns station_of() reads
+STATION_COLUMNS = ['Station.City', 'Station.Location', 'Station.Code', 'Station.State']
+
+
+class Station:
+    """A weather station, shared by every row that reports from it.
+
+    Built through station_record(), so each distinct station exists once and its
+    strings are interned; slots keep an instance at a few dozen bytes.
+    """
+
+    __slots__ = ('city', 'location', 'code', 'state')
+
+    def __init__(self, city, location, code, state):
+        self.city = city
+        self.location = location
+        self.code = code
+        self.state = state
+
+    def __reduce__(self):
+        # Unpickled stations (e.g. returned by worker processes) go through the interning table too
+        return station_record, (self.city, self.location, self.code, self.state)
+
+    def __repr__(self):
+        return f"Station({self.city!r}, {self.location!r}, {self.code!r}, {self.state!r})"
+
+
+class Observation:
+    """The date of a row and the station it came from, kept instead of the whole row dict."""
+
+    __slots__ = ('date', 'station')
+
+    def __init__(self, date, station):
+        self.date = date
+        self.station = station
+
+    def __repr__(self):
+        return f"Observation({self.date!r}, {self.station!r})"
+
+
+@lru_cache(maxsize=8192)
+def station_record(city, location, code, state):
+    """Return the shared Station for these fields, creating it on first use."""
+    return Station(sys.intern(city), sys.intern(location), sys.intern(code), sys.intern(state))
+
+
+def station_field(row, column):
+    """Return a station field of a CSV row, 'N/A' if the column is absent or the row is too short to hold it."""
+    value = row.get(column)
+    return 'N/A' if value is None else value
+
+
+def station_of(row):
+    """Return the shared Station of a CSV row, with 'N/A' for missing fields."""
+    return station_record(
+        station_field(row, 'Station.City'),
+        station_field(row, 'Station.Location'),
+        station_field(row, 'Station.Code'),
+        station_field(row, 'Station.State')
+    )
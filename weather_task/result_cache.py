@@ -0,0 +1,192 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from metrics import metrics
+
+STATS_FILE = 'stats.json'
+LOCK_FILE = '.lock'
+ENTRY_SUFFIX = '.csv'
+
+
+def normalize_date(value):
+    """Return a date, datetime or date string as YYYY-MM-DD, so equal ranges share a key."""
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return value  # Other spellings are keyed as given
+    return value.strftime('%Y-%m-%d')
+
+
+def file_digest(input_file, block_size=1 << 20):
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of analysis output files, shared by every run that points at the same directory.
+
+    Entries are keyed by the input file's identity, the analysis and the date range, and
+    evicted least recently used first once the directory grows past max_bytes.
+    Hit, miss, store and eviction counts are kept in stats.json.
+    """
+
+    def __init__(self, cache_dir, max_bytes, hash_input=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hash_input = hash_input  # Identify the input by content instead of path, size and mtime
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, args):
+        """Create the cache selected by --cache-dir, or return None when caching is off."""
+        if not args.cache_dir:
+            return None
+        return cls(args.cache_dir, args.cache_size_mb * 1024 * 1024, hash_input=args.cache_hash)
+
+    def key(self, implementation, analysis, input_file, start_date, end_date):
+        """Build the content address of one result."""
+        if self.hash_input:
+            identity = ['sha256', file_digest(input_file)]
+        else:
+            stat = os.stat(input_file)
+            identity = [os.path.realpath(input_file), stat.st_size, stat.st_mtime_ns]
+        parts = [implementation, analysis, identity, normalize_date(start_date), normalize_date(end_date)]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def entry_path(self, key):
+        """Return the file holding the result stored under key."""
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    @contextmanager
+    def locked(self):
+        """Hold the cache-wide lock, so concurrent runs update the stats and evict one at a time."""
+        with open(os.path.join(self.cache_dir, LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def count(self, counter, value=1):
+        """Add to one of the counters in stats.json; the caller holds the lock."""
+        stats = self.stats()
+        stats[counter] = stats.get(counter, 0) + value
+        with open(os.path.join(self.cache_dir, STATS_FILE), 'w') as f:
+            json.dump(stats, f)
+
+    def stats(self):
+        """Return the hit, miss, store and eviction counters."""
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def fetch(self, key, output_file):
+        """Copy a cached result to output_file and return True, or return False on a miss."""
+        path = self.entry_path(key)
+        with self.locked():
+            if not os.path.isfile(path):
+                self.count('misses')
+                return False
+            shutil.copyfile(path, output_file)
+            os.utime(path)  # Mark as recently used
+            self.count('hits')
+        return True
+
+    def store(self, key, output_file):
+        """Keep a copy of a freshly written result, then evict old entries if over the size limit."""
+        if not os.path.isfile(output_file):
+            return  # Nothing was exported, e.g. no data in the date range
+        with self.locked():
+            shutil.copyfile(output_file, self.entry_path(key) + '.tmp')
+            os.replace(self.entry_path(key) + '.tmp', self.entry_path(key))
+            self.count('stores')
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes; the caller holds the lock."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(ENTRY_SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            evicted += 1
+        if evicted:
+            self.count('evictions', evicted)
+
+
+def output_signature(output_file):
+    """Return what identifies one write of the output file, or None if there is none."""
+    try:
+        stat = os.stat(output_file)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def run_cached(args, analysis, analyze):
+    """Run analyze() unless --cache-dir holds the result of an identical earlier run."""
+    cache = ResultCache.from_args(args)
+    if cache is None:
+        analyze()
+        return
+
+    # Runs reporting a different number of results keep separate entries
+    if args.top > 1:
+        analysis = f"{analysis}:top={args.top}"
+    key = cache.key('python', analysis, args.input_file, args.start_date, args.end_date)
+    if cache.fetch(key, args.output_file):
+        metrics.count('result_cache.hits')
+        logging.info(f"Result copied from the cache to {args.output_file}")
+        return
+
+    metrics.count('result_cache.misses')
+    before = output_signature(args.output_file)
+    analyze()
+    # Only keep a file this run wrote; with no data in the range an older output is left as it was
+    if output_signature(args.output_file) not in (None, before):
+        cache.store(key, args.output_file)
+
+
+def add_cache_arguments(parser):
+    """Add the --cache-dir, --cache-size-mb and --cache-hash options to an argument parser."""
+    parser.add_argument(
+        '--cache-dir', type=str, help="Reuse results of identical earlier runs stored in this directory"
+    )
+    parser.add_argument(
+        '--cache-size-mb', type=int, default=512, help="Size limit of the result cache, least recently used entries go first"
+    )
+    parser.add_argument(
+        '--cache-hash', action='store_true', help="Identify the input file by a hash of its contents instead of path, size and mtime"
+    )
+
+
+if __name__ == "__main__":
+    # Show the counters of a result cache
+    parser = argparse.ArgumentParser(description="Show the hit/miss counters of a result cache")
+    parser.add_argument('--cache-dir', type=str, required=True, help="Result cache directory")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.cache_dir):
+        parser.error(f"Cache directory '{args.cache_dir}' does not exist.")
+    print(json.dumps(ResultCache(args.cache_dir, 0).stats(), indent=2))
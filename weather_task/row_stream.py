@@ -0,0 +1,275 @@
+import csv
+import logging
+import os
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from columnar_cache import ColumnarCache
+from compressed_input import is_compressed, open_input
+from date_filter import DateRangeFilter, is_iso_date
+from date_index import DateOffsetIndex
+from metrics import metrics
+from date_seek import find_start_offset, iter_lines, read_header_end, sample_is_sorted, split_byte_ranges
+from numpy_engine import BATCH_SIZE, RowBatch
+from projection import projected_fields
+
+
+class WeatherRowStream:
+    """Read the weather CSV once and hand every row in the date range to the registered consumers.
+
+    A consumer is any object with a process_row(row, date) method, e.g. one of the analyzers.
+    Rows only hold the columns the consumers list in COLUMNS (plus Date.Full), or every
+    column if a consumer has no COLUMNS; a listed column missing from the header is an error.
+    Consumers whose engine is 'numpy' get RowBatch objects through process_batch(batch) instead,
+    built straight from the parsed fields without a dict per row.
+    With workers > 1 consumers also need merge(other) to fold in the partial results of
+    the worker processes.
+    """
+
+    def __init__(self, input_file, start_date, end_date, sorted_input=False, workers=1, byte_range=None):
+        self.input_file = input_file
+        self.start_date = start_date
+        self.end_date = end_date
+        self.sorted_input = sorted_input  # Caller says the file is ordered by Date.Full
+        self.workers = workers  # Number of processes parsing the file in parallel
+        self.byte_range = byte_range  # (start, stop) slice of the file read by a worker
+        self.date_filter = DateRangeFilter(start_date, end_date)
+        self.in_order = True  # Cleared as soon as a row goes back in time
+        self.consumers = []  # Analyzers fed from this stream
+        self.fields = []  # Column names of the field tuples yielded by rows()
+
+    def register(self, consumer):
+        """Add a consumer that will receive every matching row."""
+        self.consumers.append(consumer)
+        return consumer
+
+    def columns(self):
+        """Return the columns the consumers read, or None if one of them needs whole rows."""
+        needed = ['Date.Full']
+        for consumer in self.consumers:
+            columns = getattr(consumer, 'COLUMNS', None)
+            if columns is None:
+                return None
+            needed += [column for column in columns if column not in needed]
+        return needed
+
+    def projected(self, lines, fieldnames):
+        """Parse CSV lines into field tuples holding only the columns the consumers read.
+
+        Raises MissingColumnError if one of those columns is not in the header.
+        """
+        columns = self.columns()
+        self.fields = list(fieldnames) if columns is None else columns
+        return projected_fields(lines, fieldnames, columns, source=self.input_file)
+
+    def rows(self):
+        """Yield (fields, date) pairs for the rows within the date range, fields named by self.fields.
+
+        A valid columnar cache (see build_cache.py) is read instead of the CSV. Otherwise,
+        with a valid sidecar index (see build_index.py) the reader seeks straight to the
+        start date and stops after the end date. With sorted_input it first spot-checks the
+        order and binary searches for the start date instead. If a row turns out to be out
+        of order, the rest of the file is read in full and the skipped head is read afterwards.
+        A compressed input (.gz, .bz2, .xz) is decompressed on the fly and always read in full.
+        """
+        if self.byte_range:
+            yield from self.byte_range_rows()
+            return
+
+        columns = self.columns()
+        with metrics.phase('open'):
+            cache = ColumnarCache.load(self.input_file)
+        if cache and columns and not set(columns) <= set(cache.columns):
+            logging.info("The columnar cache lacks columns the analyzers read, reading the CSV instead.")
+            cache.close()
+            cache = None
+        if cache:
+            # Typed column files built by build_cache.py, no CSV parsing at all
+            try:
+                self.fields = cache.field_names(columns)
+                rows = cache.rows(self.date_filter.start_date, self.date_filter.end_date, columns)
+                yield from metrics.timed('parse', rows, counter='rows_scanned')
+            finally:
+                cache.close()
+            return
+
+        skipped = None  # Byte range jumped over using the index or binary search
+        compressed = is_compressed(self.input_file)  # Byte offsets do not apply, no seeking
+        with open_input(self.input_file) as csvfile:
+            with metrics.phase('open'):
+                fieldnames = next(csv.reader(csvfile), None)  # Header, used to resolve the column positions
+                stop_early = False
+                index = DateOffsetIndex.load(self.input_file) if fieldnames and not compressed else None
+                if index:
+                    # The sidecar index was built from a sorted file that has not changed since
+                    skipped = (index.header_end, index.offset_for(self.date_filter.start_key))
+                    csvfile.seek(skipped[1])
+                    stop_early = True
+                elif self.sorted_input and compressed:
+                    logging.info("Compressed input cannot be searched, reading it in full.")
+                elif self.sorted_input and fieldnames:
+                    date_column = fieldnames.index('Date.Full')
+                    if sample_is_sorted(self.input_file, date_column):
+                        skipped = find_start_offset(self.input_file, date_column, self.date_filter.start_key)
+                        csvfile.seek(skipped[1])
+                        stop_early = True
+                    else:
+                        logging.warning("Input does not look sorted by Date.Full, falling back to a full scan.")
+
+            if fieldnames:
+                yield from self.filter_rows(self.projected(csvfile, fieldnames), stop_early=stop_early)
+
+        if skipped and skipped[0] < skipped[1] and not self.in_order:
+            logging.warning("Input is not sorted by Date.Full, also reading the rows skipped at the start.")
+            reader = self.projected(iter_lines(self.input_file, *skipped), fieldnames)
+            yield from self.filter_rows(reader, stop_early=False)
+
+        if self.in_order and not self.sorted_input and not index and not compressed:
+            logging.info("Input looks sorted by Date.Full; --sorted-input or build_index.py would let later runs skip ahead.")
+
+    def byte_range_rows(self):
+        """Yield (fields, date) pairs for the rows within the date range from this stream's byte range."""
+        with open(self.input_file) as csvfile:
+            fieldnames = next(csv.reader(csvfile), None)
+        if fieldnames:
+            reader = self.projected(iter_lines(self.input_file, *self.byte_range), fieldnames)
+            yield from self.filter_rows(reader, stop_early=False)
+
+    def filter_rows(self, reader, stop_early):
+        """Yield (fields, date) pairs from reader that fall within the date range."""
+        previous_key = ''
+        end_key = self.date_filter.end_key
+        date_position = self.fields.index('Date.Full')
+        for row in metrics.timed('parse', reader, counter='rows_scanned'):
+            date_string = row[date_position]
+            if self.in_order and is_iso_date(date_string):
+                if date_string < previous_key:
+                    self.in_order = False  # Sortedness broken, keep reading to the end
+                    if stop_early:
+                        logging.warning("Input is not sorted by Date.Full, falling back to a full scan.")
+                else:
+                    previous_key = date_string
+                    if stop_early and date_string > end_key:
+                        break  # Every remaining row is past the end date
+
+            try:
+                # Compared as a string first, parsed only when in range
+                date = self.date_filter.match(date_string)
+            except ValueError as e:
+                logging.warning(f"Skipping row due to date parsing error: {e}")
+                metrics.count('rows_skipped.date')
+                continue  # Skip this row if date parsing fails
+
+            if date is not None:
+                yield row, date
+
+    def feed(self, rows):
+        """Pass each (fields, date) pair to every consumer and return the number of rows.
+
+        Row consumers get a dict per row; batch consumers get the field tuples as columns.
+        """
+        row_consumers = [c for c in self.consumers if getattr(c, 'engine', 'python') != 'numpy']
+        batch_consumers = [c for c in self.consumers if getattr(c, 'engine', 'python') == 'numpy']
+        if not row_consumers:
+            return self.feed_batches(batch_consumers, rows)
+
+        batch_records, batch_dates = [], []
+        matched = 0
+        for fields, date in rows:
+            if row_consumers:
+                row = dict(zip(self.fields, fields))
+                for consumer in row_consumers:
+                    consumer.process_row(row, date)
+            if batch_consumers:
+                batch_records.append(fields)
+                batch_dates.append(date)
+                if len(batch_records) == BATCH_SIZE:
+                    self.feed_batch(batch_consumers, batch_records, batch_dates)
+                    batch_records, batch_dates = [], []
+            matched += 1
+
+        if batch_records:
+            self.feed_batch(batch_consumers, batch_records, batch_dates)
+        return matched
+
+    def feed_batches(self, consumers, rows):
+        """Pass the (fields, date) pairs to batch consumers only, BATCH_SIZE rows at a time."""
+        matched = 0
+        for chunk in iter(lambda: list(islice(rows, BATCH_SIZE)), []):
+            records, dates = zip(*chunk)  # Split in C rather than row by row
+            self.feed_batch(consumers, records, dates)
+            matched += len(chunk)
+        return matched
+
+    def feed_batch(self, consumers, records, dates):
+        """Hand one batch of field tuples to the vectorized consumers, sharing the converted columns."""
+        batch = RowBatch(self.fields, records, dates)
+        for consumer in consumers:
+            consumer.process_batch(batch)
+
+    def scan(self):
+        """Feed the matching rows to the consumers in this process and return how many there were."""
+        with metrics.phase('aggregate'):
+            # The time taken to produce the rows is charged to the parse and date_filter phases
+            matched = self.feed(metrics.timed('date_filter', self.rows()))
+        metrics.count('rows_matched', matched)
+        return matched
+
+    def run(self):
+        """Read the file once and pass each matching row to every consumer."""
+        parallel = self.workers > 1 and ColumnarCache.read_meta(self.input_file) is None
+        if parallel and is_compressed(self.input_file):
+            # Workers split the file at byte offsets, which a compressed stream does not have
+            logging.warning("Compressed input is read by a single process, ignoring --workers.")
+            parallel = False
+
+        if parallel:
+            with metrics.phase('parallel_scan'):
+                matched = self.run_parallel()
+        else:
+            matched = self.scan()
+
+        logging.info(f"Finished streaming {matched} rows to {len(self.consumers)} consumer(s).")
+        return matched
+
+    def run_parallel(self):
+        """Parse newline-aligned byte ranges in a process pool and merge the partial results.
+
+        Each worker gets an untouched copy of the consumers, so what comes back holds only
+        the rows of its own range. Rows must not contain quoted line breaks.
+        """
+        start, stop = read_header_end(self.input_file), os.path.getsize(self.input_file)
+        index = DateOffsetIndex.load(self.input_file)
+        if index:
+            # Only the part of the file between the start and end dates has to be read
+            start = index.offset_for(self.date_filter.start_key)
+            stop = index.offset_after(self.date_filter.end_key)
+
+        matched = 0
+        byte_ranges = split_byte_ranges(self.input_file, self.workers, start, stop)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    scan_byte_range, self.input_file, self.start_date, self.end_date, byte_range, self.consumers,
+                    metrics.enabled
+                )
+                for byte_range in byte_ranges
+            ]
+            # Merge in file order so ties resolve exactly as in a single-process scan
+            for future in futures:
+                range_matched, partials, range_metrics = future.result()
+                for consumer, partial in zip(self.consumers, partials):
+                    consumer.merge(partial)
+                metrics.merge(range_metrics)  # Phase times are summed over the workers
+                matched += range_matched
+
+        return matched
+
+
+def scan_byte_range(input_file, start_date, end_date, byte_range, consumers, collect_metrics=False):
+    """Worker process: feed one byte range of the file to the consumers and return them with the metrics."""
+    metrics.reset(enabled=collect_metrics)  # A forked worker starts with a copy of the parent's metrics
+    stream = WeatherRowStream(input_file, start_date, end_date, byte_range=byte_range)
+    for consumer in consumers:
+        stream.register(consumer)
+    matched = stream.scan()
+    return matched, consumers, metrics.snapshot()
@@ -0,0 +1,169 @@
+# Task: Run every weather analysis in a single pass over the CSV
+import logging
+import os
+from ArgParser_class import ArgParser
+from row_stream import WeatherRowStream
+from projection import MissingColumnError
+from daily_buckets import DailyBuckets
+from date_filter import to_iso
+from metrics import metrics
+from avg_cal import WeatherDataProcessor
+from highest_temp_day import HighestTemperatureFinder
+from lowest_avg_temp_year import LowestTemperatureAverageFinder
+from max_min_state_temp import StateWeatherAnalyzer
+from max_month_temp import MonthlyTemperatureAnalyzer
+from max_occurance_state import StateOccurrenceAnalyzer
+from max_temp_state import MaxTemperatureAnalyzer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Analysis names, in the order build_analyzers() creates them; also the output file suffixes
+ANALYSES = [
+    'avg_cal', 'highest_temp_day', 'lowest_avg_temp_year', 'max_min_state_temp',
+    'max_month_temp', 'max_occurance_state', 'max_temp_state'
+]
+
+class CombinedWeatherRunner:
+    def __init__(self, input_file, start_date, end_date, output_file, scan_options=None, engine='python', top=1):
+        self.input_file = input_file
+        self.start_date = start_date
+        self.end_date = end_date
+        self.output_file = output_file
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.engine = engine  # Engine used by every analyzer
+        self.top = top  # Number of results reported by the ranking analyzers
+        self.analyzers = []  # Analyzers sharing the single row stream
+
+    def output_path(self, name):
+        """Build the output file for one analysis, e.g. output.csv -> output_avg_cal.csv."""
+        base, ext = os.path.splitext(self.output_file)
+        return f"{base}_{name}{ext or '.csv'}"
+
+    def build_analyzers(self, names=None):
+        """Create one instance of every analyzer (or of the named ones), each writing to its own output file."""
+        analyzers = [
+            WeatherDataProcessor(self.input_file, self.output_path('avg_cal'), self.start_date, self.end_date, engine=self.engine),
+            HighestTemperatureFinder(self.input_file, self.start_date, self.end_date, self.output_path('highest_temp_day'), engine=self.engine, top=self.top),
+            LowestTemperatureAverageFinder(self.input_file, self.start_date, self.end_date, self.output_path('lowest_avg_temp_year'), engine=self.engine, top=self.top),
+            StateWeatherAnalyzer(self.input_file, self.start_date, self.end_date, self.output_path('max_min_state_temp'), engine=self.engine, top=self.top),
+            MonthlyTemperatureAnalyzer(self.input_file, self.start_date, self.end_date, self.output_path('max_month_temp'), engine=self.engine, top=self.top),
+            StateOccurrenceAnalyzer(self.input_file, self.start_date, self.end_date, self.output_path('max_occurance_state'), engine=self.engine, top=self.top),
+            MaxTemperatureAnalyzer(self.input_file, self.start_date, self.end_date, self.output_path('max_temp_state'), engine=self.engine, top=self.top),
+        ]
+        self.analyzers = [analyzer for name, analyzer in zip(ANALYSES, analyzers) if not names or name in names]
+        return self.analyzers
+
+    def analyze(self):
+        """Read the CSV once, feed every analyzer and export all results."""
+        stream = WeatherRowStream(self.input_file, self.start_date, self.end_date, **self.scan_options)
+        for analyzer in self.build_analyzers():
+            stream.register(analyzer)
+
+        try:
+            stream.run()
+        except FileNotFoundError:
+            logging.error(f"Error: File {self.input_file} not found.")
+            return
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
+        except Exception as e:
+            logging.error(f"Unexpected error while reading file: {e}")
+            return
+
+        with metrics.phase('export'):
+            for analyzer in self.analyzers:
+                analyzer.report()
+
+class BatchQueryRunner:
+    """Answer many date ranges from one scan over the union of the ranges.
+
+    Rows are bucketed into per-day partial analyzers once; each range then merges the
+    days it covers, so a range costs a few thousand merges instead of a pass over the file.
+    """
+
+    def __init__(self, input_file, ranges, output_file, scan_options=None, top=1):
+        self.input_file = input_file
+        self.ranges = ranges  # (start_date, end_date, analyses) tuples, see read_date_ranges
+        self.output_file = output_file
+        self.scan_options = scan_options or {}  # e.g. sorted_input, see ArgParser.scan_options
+        self.top = top  # Number of results reported by the ranking analyzers
+
+        for _, _, names in ranges:
+            unknown = sorted(set(names) - set(ANALYSES))
+            if unknown:
+                raise ValueError(f"Unknown analysis {', '.join(unknown)}, expected one of {', '.join(ANALYSES)}")
+
+    def range_output(self, start_date, end_date):
+        """Build the output file of one range, e.g. output.csv -> output_2016-01-03_2016-03-27.csv."""
+        base, ext = os.path.splitext(self.output_file)
+        return f"{base}_{to_iso(start_date)}_{to_iso(end_date)}{ext or '.csv'}"
+
+    def needed_analyses(self):
+        """Return the analyses requested by at least one range, in ANALYSES order."""
+        if any(not names for _, _, names in self.ranges):
+            return list(ANALYSES)
+        requested = {name for _, _, names in self.ranges for name in names}
+        return [name for name in ANALYSES if name in requested]
+
+    def analyze(self):
+        """Scan the file once into daily buckets, then export every range's results."""
+        if not self.ranges:
+            logging.warning("No date ranges to analyze.")
+            return
+
+        start_date = min(start for start, _, _ in self.ranges)
+        end_date = max(end for _, end, _ in self.ranges)
+        names = self.needed_analyses()
+        templates = CombinedWeatherRunner(self.input_file, start_date, end_date, self.output_file, top=self.top).build_analyzers(names)
+        buckets = dict(zip(names, (DailyBuckets(template) for template in templates)))
+
+        stream = WeatherRowStream(self.input_file, start_date, end_date, **self.scan_options)
+        for bucket in buckets.values():
+            stream.register(bucket)
+
+        try:
+            stream.run()
+        except FileNotFoundError:
+            logging.error(f"Error: File {self.input_file} not found.")
+            return
+        except MissingColumnError:
+            raise  # The input cannot answer this analysis, reported by the caller
+        except Exception as e:
+            logging.error(f"Unexpected error while reading file: {e}")
+            return
+
+        with metrics.phase('export'):
+            for start, end, range_names in self.ranges:
+                runner = CombinedWeatherRunner(self.input_file, start, end, self.range_output(start, end), top=self.top)
+                selected = [name for name in names if not range_names or name in range_names]
+                for name, analyzer in zip(selected, runner.build_analyzers(selected)):
+                    buckets[name].answer(analyzer, start, end).report()
+
+        logging.info(f"Answered {len(self.ranges)} date range(s) from one scan.")
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    args_parser = ArgParser(allow_ranges=True, allow_cache=False)  # Outputs are written per analysis, not through run_cached
+    args = args_parser.parse_args()
+
+    if args.ranges_file:
+        # Answer every range of the file from a single scan
+        try:
+            runner = BatchQueryRunner(
+                args.input_file, args.ranges, args.output_file, scan_options=args_parser.scan_options(args), top=args.top
+            )
+        except ValueError as e:
+            args_parser.parser.error(str(e))
+    else:
+        # Create an instance of CombinedWeatherRunner
+        runner = CombinedWeatherRunner(
+            args.input_file, args.start_date, args.end_date, args.output_file, scan_options=args_parser.scan_options(args),
+            engine=args.engine, top=args.top
+        )
+
+    # Run all analyses from a single scan
+    try:
+        runner.analyze()
+    except MissingColumnError as e:
+        raise SystemExit(f"Error: {e}")
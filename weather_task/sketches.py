@@ -0,0 +1,160 @@
+import hashlib
+import math
+import random
+from functools import lru_cache
+
+
+class KLLSketch:
+    """Approximate quantiles of a stream of numbers in O(k) memory (Karnin, Lang and Liberty).
+
+    Values go into a stack of compactors; a full compactor sorts itself and promotes every
+    other value to the next level, where each value stands for twice as many. Sketches of
+    separate streams merge level by level, so worker processes can each keep their own.
+    Compaction coin flips come from a seeded generator, so runs are reproducible.
+    """
+
+    def __init__(self, k=200, seed=0):
+        if k < 8:
+            raise ValueError(f"k must be at least 8, got {k}")
+        self.k = k
+        self.compactors = [[]]  # compactors[h] holds values of weight 2**h
+        self.count = 0  # Values added, including merged sketches
+        self.random = random.Random(seed)
+
+    def capacity(self, height):
+        """Return how many values a level may hold; lower levels shrink by 2/3 per step."""
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil((2 / 3) ** depth * self.k)) + 1
+
+    def add(self, value):
+        """Add a single value."""
+        self.compactors[0].append(value)
+        self.count += 1
+        if len(self.compactors[0]) >= self.capacity(0):
+            self.compress()
+
+    def compress(self):
+        """Compact the full levels, from the bottom up."""
+        for height in range(len(self.compactors)):
+            if len(self.compactors[height]) < self.capacity(height):
+                continue
+            if height + 1 == len(self.compactors):
+                self.compactors.append([])
+            values = sorted(self.compactors[height])
+            # An odd value out stays behind, every other one of the rest moves up
+            self.compactors[height] = values[:len(values) % 2]
+            values = values[len(values) % 2:]
+            self.compactors[height + 1].extend(values[self.random.randint(0, 1)::2])
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for height, values in enumerate(other.compactors):
+            self.compactors[height].extend(values)
+        self.count += other.count
+        self.compress()
+
+    def quantile(self, q):
+        """Return the value at rank q (0 to 1), or None if no values were added."""
+        weighted = sorted((value, 1 << height) for height, values in enumerate(self.compactors) for value in values)
+        if not weighted:
+            return None
+        target = q * sum(weight for _, weight in weighted)
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+    def rank_error(self):
+        """Return the normalized rank error bound at 99% confidence, 0.0 while the sketch is exact."""
+        if not any(self.compactors[1:]):
+            return 0.0  # Nothing was compacted yet, every value is still held
+        return 2.296 / self.k ** 0.9723  # Empirical bound for KLL sketches, ~1.3% for k=200
+
+
+@lru_cache(maxsize=65536)
+def hash64(value):
+    """Return a 64-bit hash of a string that is the same in every process (unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Approximate count of distinct strings in 2**precision bytes (Flajolet et al.).
+
+    Each value is hashed to a register and the register keeps the longest run of leading
+    zero bits seen; the harmonic mean of the registers estimates the distinct count.
+    Sketches merge by taking the larger register, so worker processes can each keep their own.
+    """
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"Precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        """Add a single value."""
+        hashed = hash64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1  # Position of the first 1 bit
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(max(pair) for pair in zip(self.registers, other.registers))
+
+    def estimate(self):
+        """Return the estimated number of distinct values."""
+        registers = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / registers)
+        estimate = alpha * registers * registers / sum(2.0 ** -rank for rank in self.registers)
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * registers and empty:
+            return registers * math.log(registers / empty)  # Linear counting is more accurate for small counts
+        return estimate
+
+    def relative_error(self):
+        """Return the standard error of the estimate relative to the true count."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class ReservoirSample:
+    """A uniform random sample of at most size items from a stream of unknown length (Algorithm R)."""
+
+    def __init__(self, size, seed=0):
+        if size < 1:
+            raise ValueError(f"Sample size must be at least 1, got {size}")
+        self.size = size
+        self.items = []
+        self.count = 0  # Items offered, including merged samples
+        self.random = random.Random(seed)
+
+    def add(self, item):
+        """Offer a single item; it replaces a random sampled one with probability size/count."""
+        self.count += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        position = self.random.randrange(self.count)
+        if position < self.size:
+            self.items[position] = item
+
+    def merge(self, other):
+        """Fold another sample in, so the result is a uniform sample of both streams."""
+        # Draw without replacement from the two streams to decide how many items each keeps
+        remaining = [self.count, other.count]
+        taken = [0, 0]
+        for _ in range(min(self.size, self.count + other.count)):
+            side = 0 if self.random.random() * (remaining[0] + remaining[1]) < remaining[0] else 1
+            remaining[side] -= 1
+            taken[side] += 1
+
+        self.items = self.random.sample(self.items, taken[0]) + self.random.sample(other.items, taken[1])
+        self.count += other.count
@@ -0,0 +1,64 @@
+import csv
+from datetime import datetime
+
+import pytest
+
+from highest_temp_day import HighestTemperatureFinder
+from max_min_state_temp import StateWeatherAnalyzer
+from max_occurance_state import StateOccurrenceAnalyzer
+from max_temp_state import MaxTemperatureAnalyzer
+
+HEADER = ('Data.Precipitation,Date.Full,Date.Month,Date.Week of,Date.Year,Station.City,Station.Code,Station.Location,'
+          'Station.State,Data.Temperature.Avg Temp,Data.Temperature.Max Temp,Data.Temperature.Min Temp,'
+          'Data.Wind.Direction,Data.Wind.Speed')
+SHORT_ROW = '0.95,2016-01-03,1,3,2016,Anchorage'  # Cut after the city, the later columns are missing
+ROWS = [
+    '0.8,2016-01-03,1,3,2016,Huntsville,HSV,"Huntsville, AL",Alabama,78,92,65,4,5.1',
+    '0.65,2016-01-03,1,3,2016,Phoenix,PHX,"Phoenix, AZ",Arizona,69,77,62,13,1.88',
+    '0.1,2016-01-10,1,10,2016,Denver,DEN,"Denver, CO",Colorado,90,105,70,8,12.5',
+    '0.2,2016-01-10,1,10,2016,Denver,DEN,"Denver, CO",Colorado,60,70,50,8,3.2',
+    '0.3,2016-01-17,1,17,2016,Denver,DEN,"Denver, CO",Colorado,55,60,40,8,4.0',
+]
+START, END = datetime(2016, 1, 1), datetime(2016, 12, 31)
+
+
+@pytest.fixture(params=[0, 2], ids=['first-row', 'line-4'])
+def input_file(request, tmp_path):
+    """Write the rows with the short row inserted at the given position."""
+    rows = ROWS[:request.param] + [SHORT_ROW] + ROWS[request.param:]
+    path = tmp_path / 'weather.csv'
+    path.write_text('\n'.join([HEADER] + rows) + '\n')
+    return str(path)
+
+
+def run(analyzer_class, input_file, tmp_path, engine):
+    """Run an analyzer over the input and return the rows of its output CSV."""
+    output_file = str(tmp_path / 'output.csv')
+    analyzer_class(input_file, START, END, output_file, engine=engine).analyze()
+    with open(output_file, newline='') as f:
+        return list(csv.reader(f))
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_highest_temp_day_reads_past_short_row(input_file, tmp_path, engine):
+    rows = run(HighestTemperatureFinder, input_file, tmp_path, engine)
+    assert rows[1] == ['2016-01-10', '105.0', 'Denver', 'Colorado']
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_max_temp_state_reads_past_short_row(input_file, tmp_path, engine):
+    rows = run(MaxTemperatureAnalyzer, input_file, tmp_path, engine)
+    assert rows[1] == ['105.0', 'Denver, CO', 'Colorado']
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_max_min_state_temp_reads_past_short_row(input_file, tmp_path, engine):
+    rows = run(StateWeatherAnalyzer, input_file, tmp_path, engine)
+    assert ['Max Temperature', 'Denver', 'Denver, CO', 'DEN', 'Colorado'] in rows
+    assert ['Max Wind Speed', 'Denver', 'Denver, CO', 'DEN', 'Colorado'] in rows
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_max_occurance_state_reads_past_short_row(input_file, tmp_path, engine):
+    rows = run(StateOccurrenceAnalyzer, input_file, tmp_path, engine)
+    assert rows[1] == ['Colorado', '3']
@@ -1,4 +1,6 @@
 import argparse 
+from result_cache import add_cache_arguments
+
 class ArgParser:
     def __init__(self):
         self.parser = argparse.ArgumentParser(description="Weather Data Analysis")
@@ -16,9 +18,21 @@ class ArgParser:
         self.parser.add_argument(
             '--output-file', type=str, required=True, help="Output CSV file for results"
         )
+        self.parser.add_argument(
+            '--chunksize', type=int, default=None,
+            help="Process the input in chunks of this many rows so memory is bounded by the chunk size"
+        )
+
+        # Adding arguments for the result cache
+        add_cache_arguments(self.parser)
 
     def parse_args(self):
-        return self.parser.parse_args()
+        args = self.parser.parse_args()
+        if args.cache_size_mb < 1:
+            self.parser.error("Cache size must be at least 1 MB.")
+        if args.chunksize is not None and args.chunksize < 1:
+            self.parser.error("Chunk size must be at least 1 row.")
+        return args
     
 if __name__ == "__main__":
     arg_parser = ArgParser()
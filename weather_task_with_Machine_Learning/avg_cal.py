@@ -1,33 +1,47 @@
 # Task: Find average temperature and wind data, and export to CSV
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, merge_partials
+from result_cache import open_cache
 
 # Parse command-line arguments
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'avg_cal')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
+AVERAGE_COLUMNS = [
+    'Data.Temperature.Max Temp',
+    'Data.Temperature.Min Temp',
+    'Data.Wind.Direction',
+    'Data.Wind.Speed'
+]
 
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(args.input_file, AVERAGE_COLUMNS, start_date, end_date, args.chunksize,
+                              float64_columns=AVERAGE_COLUMNS)
 
 # Function to find average (max & min) temperature, wind direction, and speed
-def find_averages(df):
-    avg_max_temp = df['Data.Temperature.Max Temp'].mean()
-    avg_min_temp = df['Data.Temperature.Min Temp'].mean()
-    avg_wind_dir = df['Data.Wind.Direction'].mean()
-    avg_wind_speed = df['Data.Wind.Speed'].mean()
-    
-    return avg_max_temp, avg_min_temp, avg_wind_dir, avg_wind_speed
+def find_averages(frames):
+    # Sum and count every column per chunk, then divide once at the end
+    totals = counts = None
+    for df in frames:
+        totals = merge_partials(totals, df[AVERAGE_COLUMNS].sum())
+        counts = merge_partials(counts, df[AVERAGE_COLUMNS].count())
+
+    if counts is None or counts.sum() == 0:
+        raise SystemExit("No data available for the specified date range.")
+    averages = totals / counts
+    return tuple(averages[column] for column in AVERAGE_COLUMNS)
 
 # Calculate the averages
-avg_max_temp, avg_min_temp, avg_wind_dir, avg_wind_speed = find_averages(df_filtered)
+avg_max_temp, avg_min_temp, avg_wind_dir, avg_wind_speed = find_averages(frames)
 
 # Export the results to a CSV file
 avg_data = pd.DataFrame({
@@ -38,6 +52,10 @@ avg_data = pd.DataFrame({
 })
 avg_data.to_csv(args.output_file, index=False)
 
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
+
 # Print success message
 print(f"Results are: {avg_data.to_string(index=False)}")
 print(f"Averages exported to {args.output_file}")
@@ -0,0 +1,110 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+# File extension -> compression, checked before the magic bytes
+EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+# Leading bytes of each compressed format
+MAGIC_BYTES = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\xfd7zXZ\x00': 'xz'}
+OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+BLOCK_SIZE = 1 << 20  # Bytes decompressed per block
+READ_AHEAD_BLOCKS = 8  # Decompressed blocks buffered ahead of the parser
+
+
+def detect_compression(input_file):
+    """Return 'gzip', 'bz2' or 'xz' for a compressed file, by extension or magic bytes, else None."""
+    compression = EXTENSIONS.get(os.path.splitext(input_file)[1].lower())
+    if compression:
+        return compression
+    with open(input_file, 'rb') as f:
+        head = f.read(6)
+    return next((name for magic, name in MAGIC_BYTES.items() if head.startswith(magic)), None)
+
+
+def is_compressed(input_file):
+    """Check whether the input has to be decompressed, and so cannot be read at byte offsets."""
+    return detect_compression(input_file) is not None
+
+
+class ReadAheadReader(io.RawIOBase):
+    """Binary stream decompressing a file in a background thread.
+
+    The thread fills a bounded queue with decompressed blocks while the caller parses the
+    previous ones, so decompression and parsing overlap; the bound keeps memory at
+    READ_AHEAD_BLOCKS blocks when the parser is the slower side.
+    """
+
+    def __init__(self, input_file, compression, block_size=BLOCK_SIZE, blocks=READ_AHEAD_BLOCKS):
+        super().__init__()
+        self.source = OPENERS[compression](input_file, 'rb')
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=blocks)
+        self.pending = memoryview(b'')  # Rest of the block being read, sliced without copying
+        self.finished = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.decompress, daemon=True)
+        self.thread.start()
+
+    def decompress(self):
+        """Background thread: put decompressed blocks on the queue, then b'' (or the error) at the end."""
+        try:
+            while not self.stopped.is_set():
+                block = self.source.read(self.block_size)
+                self.put(block)
+                if not block:
+                    return
+        except Exception as e:  # Handed to the reading thread, which raises it
+            self.put(e)
+
+    def put(self, item):
+        """Queue an item, giving up if the reader was closed in the meantime."""
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """Fill buffer from the decompressed blocks; return 0 at the end of the file."""
+        while not self.pending and not self.finished:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.finished = True
+            self.pending = memoryview(block)
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        """Stop the background thread and close the compressed file."""
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.source.close()
+        super().close()
+
+
+def open_input(input_file, binary=False):
+    """Open an input file for reading, streaming it through a read-ahead decompressor if compressed.
+
+    Returns a text stream like open(input_file), or a binary one with binary=True.
+    """
+    compression = detect_compression(input_file)
+    if compression is None:
+        return open(input_file, 'rb' if binary else 'r')
+
+    stream = io.BufferedReader(ReadAheadReader(input_file, compression), buffer_size=BLOCK_SIZE)
+    return stream if binary else io.TextIOWrapper(stream)
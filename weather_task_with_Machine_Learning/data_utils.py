@@ -1,19 +1,119 @@
+import importlib.util
+from contextlib import nullcontext
+import numpy as np
 import pandas as pd
 from ArgParser_class import ArgParser
+from compressed_input import is_compressed, open_input
+
+DATE_COLUMN = 'Date.Full'
+DATE_FORMAT = '%Y-%m-%d'
+ROW_COLUMN = 'File.Row'  # Position in the file, kept when the rows had to be sorted by date
+
+# Numeric columns are read as float32 (float64 where a script averages them), station columns as category
+METRIC_COLUMNS = [
+    'Data.Precipitation',
+    'Data.Temperature.Avg Temp',
+    'Data.Temperature.Max Temp',
+    'Data.Temperature.Min Temp',
+    'Data.Wind.Direction',
+    'Data.Wind.Speed'
+]
+STATION_COLUMNS = ['Station.City', 'Station.Location', 'Station.Code', 'Station.State']
 
 def initialize_args():
     # Initialize argument parser
     args_parser = ArgParser()
     return args_parser.parse_args()
 
-def load_dataset(input_file):
-    # Load the dataset
-    df = pd.read_csv(input_file)
-    # Convert date column to datetime
-    df['Date.Full'] = pd.to_datetime(df['Date.Full'])
+def csv_engine():
+    # Use the multithreaded pyarrow parser when it is installed
+    if importlib.util.find_spec('pyarrow') is not None:
+        return 'pyarrow'
+    return 'c'
+
+def column_dtypes(usecols, categories=True, float64_columns=()):
+    # float32 for metrics; category for station columns unless chunks must be merged later
+    # Columns that are summed for an average stay float64: float32 parsing rounds each value,
+    # which shifts the mean in its last digits
+    dtype = {}
+    for column in METRIC_COLUMNS:
+        if usecols is None or column in usecols:
+            dtype[column] = 'float64' if column in float64_columns else 'float32'
+    if categories:
+        for column in STATION_COLUMNS:
+            if usecols is None or column in usecols:
+                dtype[column] = 'category'
+    return dtype
+
+def open_source(input_file):
+    # Compressed inputs (.gz/.bz2/.xz or by magic bytes) are streamed through a read-ahead
+    # decompression thread, so decompressing and parsing overlap
+    if is_compressed(input_file):
+        return open_input(input_file, binary=True)
+    return nullcontext(input_file)
+
+def load_dataset(input_file, columns=None, chunksize=None, float64_columns=()):
+    # Read only the needed columns (plus the date) with compact dtypes
+    usecols = None
+    if columns is not None:
+        usecols = [DATE_COLUMN] + [column for column in columns if column != DATE_COLUMN]
+
+    if chunksize is not None:
+        # The pyarrow engine cannot read in chunks, and per-chunk categories do not line up
+        return pd.read_csv(input_file, usecols=usecols, dtype=column_dtypes(usecols, categories=False, float64_columns=float64_columns),
+                           chunksize=chunksize)
+
+    df = pd.read_csv(input_file, usecols=usecols, dtype=column_dtypes(usecols, float64_columns=float64_columns), engine=csv_engine())
+    return index_by_date(df)
+
+def index_by_date(df):
+    # Move the date column into a DatetimeIndex, parsed with an explicit format instead of inferring it,
+    # and sort by it once (stable, so rows of one day keep their file order) unless already sorted
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop(DATE_COLUMN), format=DATE_FORMAT), name=DATE_COLUMN)
+    if not df.index.is_monotonic_increasing:
+        df[ROW_COLUMN] = np.arange(len(df), dtype='int64')
+        df = df.sort_index(kind='stable')
     return df
 
 def filter_by_date(df, start_date, end_date):
-    # Filter by date range
-    df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
-    return df_filtered
+    # Binary search the sorted date index for the range and slice it by position,
+    # which gives a view instead of a boolean-mask copy, in O(log n) for any number of ranges
+    start = df.index.searchsorted(pd.Timestamp(start_date), side='left')
+    end = df.index.searchsorted(pd.Timestamp(end_date), side='right')
+    return df.iloc[start:end]
+
+def iter_filtered_frames(input_file, columns, start_date, end_date, chunksize=None, float64_columns=()):
+    # Yield the rows within the date range: one frame, or one frame per chunk of the file
+    with open_source(input_file) as source:
+        if chunksize is None:
+            yield filter_by_date(load_dataset(source, columns, float64_columns=float64_columns), start_date, end_date)
+            return
+
+        for chunk in load_dataset(source, columns, chunksize=chunksize, float64_columns=float64_columns):
+            yield filter_by_date(index_by_date(chunk), start_date, end_date)
+
+def update_extreme_row(best_row, df, column, largest=True):
+    # Keep the row with the largest (or smallest) value of column seen so far; earlier rows win ties
+    # The row is picked by position, as one date labels many rows
+    values = df[column]
+    if values.count() == 0:
+        return best_row
+    position = values.argmax() if largest else values.argmin()
+    if ROW_COLUMN in df:
+        # The rows were sorted by date, so of the rows tied for the extreme take the first in the file
+        tied = (values == values.iloc[position]).to_numpy()
+        position = np.flatnonzero(tied)[df[ROW_COLUMN].to_numpy()[tied].argmin()]
+    row = df.iloc[position]
+    if best_row is None:
+        return row
+    if largest and row[column] > best_row[column]:
+        return row
+    if not largest and row[column] < best_row[column]:
+        return row
+    return best_row
+
+def merge_partials(total, partial):
+    # Add a per-chunk partial result (Series or DataFrame) to the running total
+    if total is None:
+        return partial
+    return total.add(partial, fill_value=0)
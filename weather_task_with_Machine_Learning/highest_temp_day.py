@@ -1,27 +1,36 @@
 # Task: Find the day with highest temperature
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, update_extreme_row
+from result_cache import open_cache
 
 # Parse command-line arguments
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'highest_temp_day')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
-
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(
+    args.input_file, ['Data.Temperature.Max Temp', 'Station.City', 'Station.State'], start_date, end_date, args.chunksize
+)
+
+# Find the day with the highest temperature, keeping only the best row of each chunk
+highest_temp_row = None
+for df_filtered in frames:
+    highest_temp_row = update_extreme_row(highest_temp_row, df_filtered, 'Data.Temperature.Max Temp')
 
-# Find the day with the highest temperature
-highest_temp_row = df_filtered.loc[df_filtered['Data.Temperature.Max Temp'].idxmax()]
+if highest_temp_row is None:
+    raise SystemExit("No data available for the specified date range.")
 
 # Extract information
-highest_temp_date = highest_temp_row['Date.Full']
+highest_temp_date = highest_temp_row.name  # The row's label in the date index
 highest_temp_value = highest_temp_row['Data.Temperature.Max Temp']
 highest_temp_city = highest_temp_row['Station.City']
 highest_temp_state = highest_temp_row['Station.State']
@@ -37,6 +46,10 @@ output_data = pd.DataFrame({
 # Export the results to a CSV file
 output_data.to_csv(args.output_file, index=False)
 
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
+
 print(f"Result is: {output_data.to_string(index = False)}")
 # Print a success message
 print(f"Results exported to {args.output_file}")
@@ -1,29 +1,40 @@
 # Task: Find the year with lowest temperature average
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, merge_partials
+from result_cache import open_cache
 
 # Initialize argument parser
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'lowest_avg_temp_year')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
-
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(args.input_file, ['Data.Temperature.Avg Temp'], start_date, end_date, args.chunksize,
+                              float64_columns=['Data.Temperature.Avg Temp'])
 
+# Sum and count the temperatures of each year chunk by chunk
+# The year is taken from the date index without adding a column, and the partial sums are merged.
+yearly_totals = None
+for df_filtered in frames:
+    year = df_filtered.index.year.rename('Year')
+    partial = df_filtered.groupby(year)['Data.Temperature.Avg Temp'].agg(['sum', 'count'])
+    yearly_totals = merge_partials(yearly_totals, partial)
 
-# Extract the year from the date
-df_filtered['Year'] = df_filtered['Date.Full'].dt.year
+if yearly_totals is None:
+    raise SystemExit("No data available for the specified date range.")
 
-# Calculate the average temperature for each year
-# Groups the filtered DataFrame by the 'Year' column and calculates the average of the 'Data.Temperature.Avg Temp' column for each year.
-yearly_avg_temp = df_filtered.groupby('Year')['Data.Temperature.Avg Temp'].mean().reset_index()
+# Calculate the average temperature for each year, leaving out years without any temperature
+yearly_avg_temp = (yearly_totals['sum'] / yearly_totals['count']).rename('Data.Temperature.Avg Temp').dropna().reset_index()
+if yearly_avg_temp.empty:
+    raise SystemExit("No data available for the specified date range.")
 
 # Find the year with the lowest average temperature
 lowest_avg_temp_row = yearly_avg_temp.loc[yearly_avg_temp['Data.Temperature.Avg Temp'].idxmin()]
@@ -41,6 +52,10 @@ output_data = pd.DataFrame({
 # Export the results to a CSV file
 output_data.to_csv(args.output_file, index=False)
 
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
+
 # Print the result
 print(f"Year with lowest average temperature: {lowest_avg_temp_year} with an average temperature of {lowest_avg_temp_value:.2f}°C")
 
@@ -1,34 +1,48 @@
 # Task: Find the state with maximum temperature, maximum wind speed, minimum temperature, and minimum wind speed
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, update_extreme_row
+from result_cache import open_cache
 
 # Initialize argument parser
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'max_min_state')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
-
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(args.input_file, [
+    'Data.Temperature.Max Temp',
+    'Data.Temperature.Min Temp',
+    'Data.Wind.Speed',
+    'Station.City',
+    'Station.Location',
+    'Station.Code',
+    'Station.State'
+], start_date, end_date, args.chunksize)
 
+max_temp_row = max_wind_speed_row = min_temp_row = min_wind_speed_row = None
+for df_filtered in frames:
+    # 1. Find the row with the maximum temperature
+    max_temp_row = update_extreme_row(max_temp_row, df_filtered, 'Data.Temperature.Max Temp')
 
-# 1. Find the row with the maximum temperature
-max_temp_row = df_filtered.loc[df_filtered['Data.Temperature.Max Temp'].idxmax()]
+    # 2. Find the row with the maximum wind speed
+    max_wind_speed_row = update_extreme_row(max_wind_speed_row, df_filtered, 'Data.Wind.Speed')
 
-# 2. Find the row with the maximum wind speed
-max_wind_speed_row = df_filtered.loc[df_filtered['Data.Wind.Speed'].idxmax()]
+    # 3. Find the row with the minimum temperature
+    min_temp_row = update_extreme_row(min_temp_row, df_filtered, 'Data.Temperature.Min Temp', largest=False)
 
-# 3. Find the row with the minimum temperature
-min_temp_row = df_filtered.loc[df_filtered['Data.Temperature.Min Temp'].idxmin()]
+    # 4. Find the row with the minimum wind speed
+    min_wind_speed_row = update_extreme_row(min_wind_speed_row, df_filtered, 'Data.Wind.Speed', largest=False)
 
-# 4. Find the row with the minimum wind speed
-min_wind_speed_row = df_filtered.loc[df_filtered['Data.Wind.Speed'].idxmin()]
+if max_temp_row is None:
+    raise SystemExit("No data available for the specified date range.")
 
 # Extract the required information (city, location, code, state)
 data = {
@@ -45,5 +59,9 @@ output_data = pd.DataFrame(data)
 # Export the results to a CSV file
 output_data.to_csv(args.output_file, index=False)
 
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
+
 # Print a success message
 print(f"Results exported to {args.output_file}")
@@ -1,28 +1,41 @@
 #Task: Find the month with highest temperature average
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, merge_partials
+from result_cache import open_cache
 
 # Initialize argument parser
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'max_month_temp')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
-
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(args.input_file, ['Data.Temperature.Avg Temp'], start_date, end_date, args.chunksize,
+                              float64_columns=['Data.Temperature.Avg Temp'])
+
+# Sum and count the temperatures of each month chunk by chunk
+monthly_totals = None
+for df_filtered in frames:
+    # Extract the year and month from the date index, without adding columns
+    year = df_filtered.index.year.rename('Year')
+    month = df_filtered.index.month.rename('Month')
+    partial = df_filtered.groupby([year, month])['Data.Temperature.Avg Temp'].agg(['sum', 'count'])
+    monthly_totals = merge_partials(monthly_totals, partial)
 
-# Extract the month from the date
-df_filtered['Month'] = df_filtered['Date.Full'].dt.month
-df_filtered['Year'] = df_filtered['Date.Full'].dt.year
+if monthly_totals is None:
+    raise SystemExit("No data available for the specified date range.")
 
-# Calculate the average temperature for each month
-monthly_avg_temp = df_filtered.groupby(['Year', 'Month'])['Data.Temperature.Avg Temp'].mean().reset_index()
+# Calculate the average temperature for each month, leaving out months without any temperature
+monthly_avg_temp = (monthly_totals['sum'] / monthly_totals['count']).rename('Data.Temperature.Avg Temp').dropna().reset_index()
+if monthly_avg_temp.empty:
+    raise SystemExit("No data available for the specified date range.")
 
 # Find the month with the highest average temperature
 highest_avg_temp_row = monthly_avg_temp.loc[monthly_avg_temp['Data.Temperature.Avg Temp'].idxmax()]
@@ -43,5 +56,9 @@ output_data = pd.DataFrame({
 # Export the results to a CSV file
 output_data.to_csv(args.output_file, index=False)
 
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
+
 # Print a success message
 print(f"Results exported to {args.output_file}")
@@ -1,22 +1,34 @@
 # Task: Find the state with maximum occurrences
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, merge_partials
+from result_cache import open_cache
 
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'max_occurance')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
-
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(args.input_file, ['Station.State'], start_date, end_date, args.chunksize)
+
+# Count the states chunk by chunk
+state_counts = None
+for df_filtered in frames:
+    state_counts = merge_partials(state_counts, df_filtered['Station.State'].value_counts())
+
+# A categorical column also counts the states with no rows in the range, drop those
+if state_counts is not None:
+    state_counts = state_counts[state_counts > 0].astype('int64')
+if state_counts is None or state_counts.empty:
+    raise SystemExit("No data available for the specified date range.")
 
-state_counts = df_filtered['Station.State'].value_counts()
 most_common_state = state_counts.idxmax()  # Get the state with the most occurrences
 max_occurrences = state_counts.max()  # Get the number of occurrences
 
@@ -31,4 +43,8 @@ output_data = pd.DataFrame({
 })
 
 output_data.to_csv(args.output_file, index=False)
+
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
 print(f"Results exported to {args.output_file}")
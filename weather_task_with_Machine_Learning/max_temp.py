@@ -1,22 +1,32 @@
 # Task: Find maximum temperature and its corresponding location and state
 import pandas as pd
 from ArgParser_class import ArgParser
+from data_utils import iter_filtered_frames, update_extreme_row
+from result_cache import open_cache
 
 args_parser = ArgParser()
 args = args_parser.parse_args()
 
-# Load the dataset
-df = pd.read_csv(args.input_file)
+# Reuse the result of an identical earlier run if --cache-dir holds one
+result_cache, cache_key = open_cache(args, 'max_temp')
+if result_cache and result_cache.fetch(cache_key, args.output_file):
+    print(f"Result copied from the cache to {args.output_file}")
+    raise SystemExit(0)
 
-# Convert date column to datetime
-df['Date.Full'] = pd.to_datetime(df['Date.Full'])
-
-# Filter by date range
+# Load only the columns this task needs, filtered by date range, chunk by chunk if requested
 start_date = pd.to_datetime(args.start_date)
 end_date = pd.to_datetime(args.end_date)
-df_filtered = df[(df['Date.Full'] >= start_date) & (df['Date.Full'] <= end_date)]
+frames = iter_filtered_frames(
+    args.input_file, ['Data.Temperature.Max Temp', 'Station.Location', 'Station.State'], start_date, end_date, args.chunksize
+)
+
+# Keep only the row with the highest temperature of each chunk
+max_temp_row = None
+for df_filtered in frames:
+    max_temp_row = update_extreme_row(max_temp_row, df_filtered, 'Data.Temperature.Max Temp')
 
-max_temp_row = df_filtered.loc[df_filtered['Data.Temperature.Max Temp'].idxmax()]
+if max_temp_row is None:
+    raise SystemExit("No data available for the specified date range.")
 
 # Extract the maximum temperature, location, and state
 max_temp = max_temp_row['Data.Temperature.Max Temp']
@@ -36,4 +46,8 @@ output_data = pd.DataFrame({
 })
 
 output_data.to_csv(args.output_file, index=False)
+
+# Keep the result for identical later runs
+if result_cache:
+    result_cache.store(cache_key, args.output_file)
 print(f"Results exported to {args.output_file}")